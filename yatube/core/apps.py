@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import db  # noqa: F401
+        if settings.TEMPLATE_WARMUP:
+            from .template_warmup import template_names, warm_up
+            warm_up(template_names())
@@ -0,0 +1,122 @@
+"""ASGI-обёртка над WSGI-приложением Django 2.2.
+
+В Django 2.2 нет асинхронных представлений, поэтому event loop только
+принимает соединения и читает тела запросов, а сами представления идут
+в ограниченном пуле потоков. Медленный клиент держит корутину,
+а не поток воркера.
+"""
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _wsgi_str(value):
+    return value.encode('utf-8').decode('latin-1')
+
+
+def build_environ(scope, body):
+    """WSGI environ из ASGI scope (HTTP)."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    query_string = scope.get('query_string', b'').decode('latin-1')
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        # WSGI ждёт уже раскодированный путь, байты UTF-8 как latin-1.
+        'SCRIPT_NAME': _wsgi_str(scope.get('root_path', '')),
+        'PATH_INFO': _wsgi_str(scope['path']),
+        'QUERY_STRING': query_string,
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    raw_path = scope.get('raw_path')
+    if raw_path:
+        uri = raw_path.decode('latin-1')
+        if query_string:
+            uri = f'{uri}?{query_string}'
+        environ['RAW_URI'] = environ['REQUEST_URI'] = uri
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        if name in environ:
+            # Повторные cookie (HTTP/2) склеиваются через «; »: запятую
+            # parse_cookie не считает разделителем.
+            separator = '; ' if name == 'HTTP_COOKIE' else ','
+            value = f'{environ[name]}{separator}{value}'
+        environ[name] = value
+    return environ
+
+
+def run_wsgi(wsgi_app, environ):
+    """Выполняет WSGI-приложение и собирает ответ целиком."""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [
+            (name.lower().encode('latin-1'), value.encode('latin-1'))
+            for name, value in headers
+        ]
+
+    result = wsgi_app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return started['status'], started['headers'], body
+
+
+class WSGIToASGI:
+    def __init__(self, wsgi_app, max_workers):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='asgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f'Неподдерживаемый тип: {scope["type"]}')
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        loop = asyncio.get_running_loop()
+        status, headers, content = await loop.run_in_executor(
+            self.executor, run_wsgi, self.wsgi_app,
+            build_environ(scope, bytes(body)),
+        )
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers,
+        })
+        await send({'type': 'http.response.body', 'body': content})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
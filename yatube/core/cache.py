@@ -0,0 +1,155 @@
+"""Общий для всех процессов кэш в файле SQLite.
+
+LocMemCache у каждого воркера свой, поэтому инвалидация версий и
+блокировки перерисовки лент не видны соседним процессам. Этот бэкенд
+хранит записи в одном файле SQLite (WAL), а add() и incr() выполняет
+атомарно внутри транзакции, как это делают memcached и Redis.
+"""
+import itertools
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+)
+ALIVE = '(expires IS NULL OR expires > ?)'
+CULL_EVERY = 100
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._location = location
+        self._local = threading.local()
+        self._busy_timeout = params.get('OPTIONS', {}).get('timeout', 5)
+        self._writes = itertools.count(1)
+
+    @property
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self._location,
+                timeout=self._busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _expires(self, timeout):
+        # Базовый класс уже переводит таймаут в абсолютное время.
+        return self.get_backend_timeout(timeout)
+
+    @staticmethod
+    def _dump(value):
+        # Целые числа хранятся как есть, чтобы incr() шёл одним UPDATE.
+        if type(value) is int:
+            return value
+        return sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def _load(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        row = self._connection.execute(
+            f'SELECT value FROM cache WHERE key = ? AND {ALIVE}',
+            (self._key(key, version), time.time()),
+        ).fetchone()
+        return default if row is None else self._load(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._connection.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            (self._key(key, version), self._dump(value),
+             self._expires(timeout)),
+        )
+        self._maybe_cull()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        connection = self._connection
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute(
+                f'DELETE FROM cache WHERE key = ? AND NOT {ALIVE}',
+                (key, time.time()),
+            )
+            added = connection.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (key, self._dump(value), self._expires(timeout)),
+            ).rowcount == 1
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        connection = self._connection
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute(
+                f'UPDATE cache SET value = value + ? WHERE key = ? '
+                f"AND typeof(value) = 'integer' AND {ALIVE}",
+                (delta, key, time.time()),
+            ).rowcount and connection.execute(
+                'SELECT value FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+        if not row:
+            raise ValueError("Key '%s' not found" % key)
+        return row[0]
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._connection.execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {ALIVE}',
+            (self._expires(timeout), self._key(key, version), time.time()),
+        ).rowcount == 1
+
+    def delete(self, key, version=None):
+        self._connection.execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),)
+        )
+
+    def has_key(self, key, version=None):
+        return self._connection.execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {ALIVE}',
+            (self._key(key, version), time.time()),
+        ).fetchone() is not None
+
+    def clear(self):
+        self._connection.execute('DELETE FROM cache')
+
+    def _maybe_cull(self):
+        if next(self._writes) % CULL_EVERY:
+            return
+        connection = self._connection
+        connection.execute(
+            f'DELETE FROM cache WHERE NOT {ALIVE}', (time.time(),)
+        )
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries and self._cull_frequency:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                (count // self._cull_frequency,),
+            )
+
+    def close(self, **kwargs):
+        # Соединение живёт всё время жизни потока, как у memcached.
+        pass
@@ -0,0 +1,16 @@
+"""Настройка соединений SQLite через PRAGMA из профиля базы."""
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def apply_pragmas(connection, pragmas):
+    """Выполняет PRAGMA на сыром соединении sqlite3."""
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    pragmas = connection.settings_dict.get('PRAGMAS')
+    if connection.vendor == 'sqlite' and pragmas:
+        apply_pragmas(connection.connection, pragmas)
@@ -0,0 +1,126 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.db import apply_pragmas
+
+SCHEMA = (
+    'CREATE TABLE post ('
+    'id INTEGER PRIMARY KEY, author_id INTEGER NOT NULL, '
+    'text TEXT NOT NULL, pub_date REAL NOT NULL)',
+    'CREATE INDEX post_author_pub_date ON post (author_id, pub_date DESC)',
+)
+AUTHORS = 100
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность SQLite на конкурентных чтениях '
+        'и записях с профилями базы из DATABASE_PROFILES'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiles', nargs='+', default=['default', 'production'],
+            choices=sorted(settings.DATABASE_PROFILES),
+        )
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--rows', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        for name in options['profiles']:
+            with tempfile.TemporaryDirectory() as folder:
+                path = os.path.join(folder, 'bench.sqlite3')
+                result = self.run(
+                    path, settings.DATABASE_PROFILES[name], options
+                )
+            seconds = options['seconds']
+            self.stdout.write(
+                f'{name:>12}: чтений {result["reads"] / seconds:9.0f}/с'
+                f'  записей {result["writes"] / seconds:8.0f}/с'
+                f'  ошибок блокировки {result["locked"]}'
+            )
+
+    def connect(self, path, profile):
+        connection = sqlite3.connect(
+            path,
+            isolation_level=None,
+            check_same_thread=False,
+            **profile.get('OPTIONS', {}),
+        )
+        apply_pragmas(connection, profile.get('PRAGMAS', {}))
+        return connection
+
+    def run(self, path, profile, options):
+        connection = self.connect(path, profile)
+        for statement in SCHEMA:
+            connection.execute(statement)
+        with connection:
+            connection.executemany(
+                'INSERT INTO post (author_id, text, pub_date) '
+                'VALUES (?, ?, ?)',
+                (
+                    (number % AUTHORS, 'текст ' * 20, time.time())
+                    for number in range(options['rows'])
+                ),
+            )
+        connection.close()
+        result = {'reads': 0, 'writes': 0, 'locked': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['seconds']
+        # Без CONN_MAX_AGE соединение открывается на каждый запрос.
+        persistent = bool(profile.get('CONN_MAX_AGE'))
+
+        def worker(kind, number):
+            connection = self.connect(path, profile) if persistent else None
+            done = locked = 0
+            while time.monotonic() < deadline:
+                current = connection or self.connect(path, profile)
+                try:
+                    self.operation(current, kind, number, done)
+                    done += 1
+                except sqlite3.OperationalError:
+                    locked += 1
+                finally:
+                    if not persistent:
+                        current.close()
+            with lock:
+                result[kind] += done
+                result['locked'] += locked
+
+        threads = [
+            threading.Thread(target=worker, args=(kind, number))
+            for kind, count in (
+                ('reads', options['readers']), ('writes', options['writers'])
+            )
+            for number in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return result
+
+    @staticmethod
+    def operation(connection, kind, number, step):
+        author_id = (number * 7 + step) % AUTHORS
+        if kind == 'reads':
+            connection.execute(
+                'SELECT id, text, pub_date FROM post WHERE author_id = ? '
+                'ORDER BY pub_date DESC LIMIT 10',
+                (author_id,),
+            ).fetchall()
+            return
+        with connection:
+            connection.execute(
+                'INSERT INTO post (author_id, text, pub_date) '
+                'VALUES (?, ?, ?)',
+                (author_id, 'новый пост', time.time()),
+            )
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.template_warmup import template_names, warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        'Компилирует все шаблоны проекта: проверка перед выкладкой '
+        'и замер времени разбора'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Вместе с шаблонами приложений (admin и т. п.)',
+        )
+
+    def handle(self, *args, **options):
+        names = template_names(include_apps=options['all'])
+        started = time.perf_counter()
+        errors = warm_up(names)
+        elapsed = (time.perf_counter() - started) * 1000
+        for name, error in errors.items():
+            self.stderr.write(f'{name}: {error}')
+        if errors:
+            raise CommandError(f'Не компилируется шаблонов: {len(errors)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Скомпилировано шаблонов: {len(names)} за {elapsed:.1f} мс'
+        ))
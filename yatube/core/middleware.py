@@ -0,0 +1,208 @@
+"""Профилирование запросов и закрепление клиента за основной базой.
+
+Профилирование (SQL, шаблоны, кэш и выборочный cProfile) включается
+настройкой REQUEST_PROFILING['ENABLED']; выключенное middleware
+снимает себя из цепочки через MiddlewareNotUsed.
+Итоги запроса уходят в заголовок Server-Timing и одной JSON-строкой
+в логгер yatube.requests (RotatingFileHandler в settings.LOGGING).
+"""
+import cProfile
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template
+
+from . import routers
+
+logger = logging.getLogger('yatube.requests')
+
+_active = threading.local()
+_MISSING = object()
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = Counter()
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries[(sql, repr(params))] += 1
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    @property
+    def duplicate_queries(self):
+        return self.query_count - len(self.queries)
+
+
+def _timed_render(render):
+    def wrapper(self, *args, **kwargs):
+        stats = getattr(_active, 'stats', None)
+        if stats is None:
+            return render(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            stats.template_time += time.perf_counter() - started
+    wrapper.timed = True
+    return wrapper
+
+
+def _install_template_timer():
+    # Обёртка бэкенда вызывается только для шаблонов верхнего уровня,
+    # include внутри них не считается второй раз.
+    if not getattr(Template.render, 'timed', False):
+        Template.render = _timed_render(Template.render)
+
+
+@contextmanager
+def _counting_cache(stats):
+    """Считает попадания и промахи в кэши текущего потока."""
+    patched = []
+    for alias in settings.CACHES:
+        backend = caches[alias]
+        get, get_many = backend.get, backend.get_many
+
+        def counted_get(key, default=None, version=None, get=get):
+            value = get(key, _MISSING, version=version)
+            if value is _MISSING:
+                stats.cache_misses += 1
+                return default
+            stats.cache_hits += 1
+            return value
+
+        def counted_get_many(keys, version=None, get_many=get_many):
+            keys = list(keys)
+            found = get_many(keys, version=version)
+            stats.cache_hits += len(found)
+            stats.cache_misses += len(keys) - len(found)
+            return found
+
+        backend.get, backend.get_many = counted_get, counted_get_many
+        patched.append(backend)
+    try:
+        yield
+    finally:
+        for backend in patched:
+            del backend.get, backend.get_many
+
+
+class RequestProfilingMiddleware:
+    def __init__(self, get_response):
+        config = settings.REQUEST_PROFILING
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.profile_every = config['PROFILE_EVERY']
+        self.profile_dir = config['PROFILE_DIR']
+        self.requests = itertools.count(1)
+        _install_template_timer()
+        if self.profile_every:
+            os.makedirs(self.profile_dir, exist_ok=True)
+
+    def __call__(self, request):
+        number = next(self.requests)
+        stats = RequestStats()
+        profiler = None
+        if self.profile_every and number % self.profile_every == 0:
+            profiler = cProfile.Profile()
+        started = time.perf_counter()
+        _active.stats = stats
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(stats.record_query))
+                stack.enter_context(_counting_cache(stats))
+                if profiler:
+                    profiler.enable()
+                    stack.callback(profiler.disable)
+                response = self.get_response(request)
+        finally:
+            _active.stats = None
+        total = time.perf_counter() - started
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={stats.sql_time * 1000:.1f};'
+            f'desc="{stats.query_count} queries, '
+            f'{stats.duplicate_queries} duplicates"',
+            f'tpl;dur={stats.template_time * 1000:.1f}',
+            f'cache;desc="{stats.cache_hits} hits, '
+            f'{stats.cache_misses} misses"',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        record = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'queries': stats.query_count,
+            'duplicate_queries': stats.duplicate_queries,
+            'sql_ms': round(stats.sql_time * 1000, 2),
+            'template_ms': round(stats.template_time * 1000, 2),
+            'cache_hits': stats.cache_hits,
+            'cache_misses': stats.cache_misses,
+        }
+        if profiler:
+            record['profile'] = os.path.join(
+                self.profile_dir, f'{int(time.time() * 1000)}-{number}.prof'
+            )
+            profiler.dump_stats(record['profile'])
+        logger.info(json.dumps(record, ensure_ascii=False))
+        return response
+
+
+class PrimaryPinningMiddleware:
+    """Читает из основной базы после записей клиента.
+
+    Запрос, который что-то записал, ставит cookie с моментом, до которого
+    чтения этого клиента идут мимо реплик (REPLICA_PIN_SECONDS).
+    """
+
+    cookie_name = 'primary_until'
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(self.cookie_name, 0))
+        except ValueError:
+            pinned_until = 0
+        routers.reset(
+            pinned=request.method not in ('GET', 'HEAD', 'OPTIONS')
+            or pinned_until > time.time()
+        )
+        try:
+            response = self.get_response(request)
+            if routers.has_written():
+                seconds = settings.REPLICA_PIN_SECONDS
+                response.set_cookie(
+                    self.cookie_name, str(time.time() + seconds),
+                    max_age=seconds, httponly=True,
+                )
+        finally:
+            routers.reset()
+        return response
@@ -0,0 +1,93 @@
+"""Чтение с реплик, запись в основную базу.
+
+По умолчанию все чтения идут в основную базу. На случайную реплику из
+DATABASE_REPLICAS уходят только чтения внутри replica() — её включают
+ленты декоратором replica_reads. Запрос с небезопасным методом, запрос
+после недавней записи этого клиента (cookie PrimaryPinningMiddleware),
+поток, который уже что-то записал, и код внутри primary() читают
+из основной базы, чтобы пользователь сразу видел свои изменения.
+"""
+import random
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+
+PRIMARY = 'default'
+
+_state = threading.local()
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', False)
+
+
+def uses_replica():
+    return getattr(_state, 'replica', False)
+
+
+def has_written():
+    return getattr(_state, 'written', False)
+
+
+def mark_written():
+    _state.written = True
+
+
+def reset(pinned=False, replica=False, written=False):
+    _state.pinned = pinned
+    _state.replica = replica
+    _state.written = written
+
+
+@contextmanager
+def primary():
+    """Все чтения внутри блока идут в основную базу."""
+    pinned = is_pinned()
+    _state.pinned = True
+    try:
+        yield
+    finally:
+        _state.pinned = pinned
+
+
+@contextmanager
+def replica():
+    """Чтения внутри блока могут идти на реплики."""
+    allowed = uses_replica()
+    _state.replica = True
+    try:
+        yield
+    finally:
+        _state.replica = allowed
+
+
+def replica_reads(view):
+    """Декоратор view, которому можно читать с реплик."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with replica():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            not settings.DATABASE_REPLICAS or not uses_replica()
+            or is_pinned() or has_written()
+        ):
+            return PRIMARY
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        mark_written()
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, объекты из них совместимы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
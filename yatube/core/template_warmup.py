@@ -0,0 +1,44 @@
+"""Предварительная компиляция шаблонов для cached.Loader.
+
+Без прогрева каждый процесс разбирает base.html, шапку, карточку поста
+и пагинатор при первом запросе к каждой странице. Прогрев загружает все
+шаблоны заранее, и cached.Loader держит их разобранными.
+"""
+import logging
+import os
+
+from django.template import TemplateSyntaxError, engines
+from django.template.utils import get_app_template_dirs
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = ('.html', '.txt')
+
+
+def template_names(include_apps=False):
+    """Имена шаблонов из DIRS, а с include_apps — и из приложений."""
+    directories = list(engines['django'].engine.dirs)
+    if include_apps:
+        directories += [str(path) for path in get_app_template_dirs(
+            'templates')]
+    names = set()
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.endswith(EXTENSIONS):
+                    path = os.path.relpath(os.path.join(root, name), directory)
+                    names.add(path.replace(os.sep, '/'))
+    return sorted(names)
+
+
+def warm_up(names):
+    """Компилирует шаблоны; возвращает {имя: ошибка} для сломанных."""
+    engine = engines['django']
+    errors = {}
+    for name in names:
+        try:
+            engine.get_template(name)
+        except TemplateSyntaxError as error:
+            logger.error('Шаблон %s не компилируется: %s', name, error)
+            errors[name] = error
+    return errors
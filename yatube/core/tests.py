@@ -0,0 +1,261 @@
+import asyncio
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import HttpResponse
+from django.template import engines
+from django.test import (
+    Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+)
+from django.urls import resolve
+
+from core.asgi import WSGIToASGI, build_environ
+from core.cache import SQLiteCache
+from core.db import apply_pragmas
+from core.middleware import PrimaryPinningMiddleware
+from core import routers
+from core.routers import ReplicaRouter, primary, replica_reads
+from core.template_warmup import template_names, warm_up
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        location = os.path.join(self.directory, 'cache.sqlite3')
+        params = {'KEY_PREFIX': 'yatube'}
+        self.cache = SQLiteCache(location, params)
+        self.other_process = SQLiteCache(location, params)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_values_are_shared(self):
+        self.cache.set('page', {'content': b'<html>'})
+        self.assertEqual(
+            self.other_process.get('page'), {'content': b'<html>'})
+        self.other_process.delete('page')
+        self.assertIsNone(self.cache.get('page'))
+
+    def test_add_is_exclusive(self):
+        self.assertTrue(self.cache.add('lock', True, 30))
+        self.assertFalse(self.other_process.add('lock', True, 30))
+
+    def test_incr(self):
+        self.cache.set('version', 1, None)
+        self.other_process.incr('version')
+        self.assertEqual(self.cache.incr('version', 5), 7)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expired_entries_are_hidden(self):
+        self.cache.set('short', 'value', 0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.other_process.get('short'))
+        self.assertTrue(self.other_process.add('short', 'new'))
+
+    def test_key_prefix(self):
+        unprefixed = SQLiteCache(
+            os.path.join(self.directory, 'cache.sqlite3'), {}
+        )
+        self.cache.set('page', 'prefixed')
+        self.assertIsNone(unprefixed.get('page'))
+
+
+class RequestProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_disabled_by_default(self):
+        response = Client().get('/about/author/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_server_timing_and_sampled_profile(self):
+        config = {
+            'ENABLED': True,
+            'PROFILE_EVERY': 2,
+            'PROFILE_DIR': self.directory,
+        }
+        with override_settings(REQUEST_PROFILING=config):
+            client = Client()
+            with self.assertLogs('yatube.requests') as logs:
+                response = client.get('/')
+                client.get('/')
+        timing = response['Server-Timing']
+        for metric in ('db;dur=', 'tpl;dur=', 'cache;desc=', 'total;dur='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, timing)
+        self.assertIn('"queries"', logs.output[0])
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+
+class DatabaseProfileTests(TestCase):
+    def test_health_check(self):
+        response = Client().get('/health/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'ok')
+        self.assertIn('default', response.json()['databases'])
+
+    def test_production_pragmas(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        connection = sqlite3.connect(os.path.join(directory, 'db.sqlite3'))
+        self.addCleanup(connection.close)
+        apply_pragmas(
+            connection,
+            settings.DATABASE_PROFILES['production']['PRAGMAS'],
+        )
+        self.assertEqual(
+            connection.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        self.assertEqual(
+            connection.execute('PRAGMA synchronous').fetchone()[0], 1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica0'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def handle(self, request, write=False):
+        seen = {}
+
+        @replica_reads
+        def view(request):
+            if write:
+                self.router.db_for_write(None)
+            seen['read'] = self.router.db_for_read(None)
+            return HttpResponse()
+
+        response = PrimaryPinningMiddleware(view)(request)
+        return seen['read'], response
+
+    def test_reads_go_to_replica(self):
+        database, response = self.handle(self.factory.get('/'))
+        self.assertEqual(database, 'replica0')
+        self.assertNotIn(
+            PrimaryPinningMiddleware.cookie_name, response.cookies)
+
+    def test_reads_outside_views_go_to_primary(self):
+        routers.reset()
+        self.assertEqual(self.router.db_for_read(None), 'default')
+        with routers.replica():
+            self.assertEqual(self.router.db_for_read(None), 'replica0')
+
+    def test_read_after_write_outside_middleware(self):
+        # Команды и фоновые потоки живут без PrimaryPinningMiddleware.
+        routers.reset()
+        self.addCleanup(routers.reset)
+        with routers.replica():
+            self.router.db_for_write(None)
+            self.assertEqual(self.router.db_for_read(None), 'default')
+
+    def test_client_is_pinned_after_write(self):
+        database, response = self.handle(
+            self.factory.post('/'), write=True)
+        self.assertEqual(database, 'default')
+        cookie = response.cookies[PrimaryPinningMiddleware.cookie_name]
+        request = self.factory.get('/')
+        request.COOKIES[cookie.key] = cookie.value
+        self.assertEqual(self.handle(request)[0], 'default')
+        request.COOKIES[cookie.key] = str(time.time() - 1)
+        self.assertEqual(self.handle(request)[0], 'replica0')
+
+    def test_primary_block(self):
+        routers.reset()
+        with routers.replica():
+            with primary():
+                self.assertEqual(self.router.db_for_read(None), 'default')
+            self.assertEqual(self.router.db_for_read(None), 'replica0')
+
+
+class WSGIToASGITests(SimpleTestCase):
+    def test_request_runs_in_thread_pool(self):
+        def wsgi_app(environ, start_response):
+            start_response('201 Created', [('Content-Type', 'text/plain')])
+            return [
+                environ['PATH_INFO'].encode('latin-1'),
+                b'?', environ['QUERY_STRING'].encode(),
+                b' ', environ['HTTP_X_TOKEN'].encode(),
+                b' ', environ['wsgi.input'].read(),
+                b' ', threading.current_thread().name.encode(),
+            ]
+
+        app = WSGIToASGI(wsgi_app, max_workers=1)
+        self.addCleanup(app.executor.shutdown)
+        chunks = [
+            {'type': 'http.request', 'body': b'a', 'more_body': True},
+            {'type': 'http.request', 'body': b'b'},
+        ]
+        sent = []
+
+        async def receive():
+            return chunks.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(app({
+            'type': 'http', 'method': 'POST', 'path': '/posts/1/',
+            'query_string': b'page=2', 'headers': [(b'x-token', b'42')],
+        }, receive, send))
+        self.assertEqual(sent[0]['status'], 201)
+        self.assertIn((b'content-type', b'text/plain'), sent[0]['headers'])
+        self.assertEqual(sent[1]['body'], b'/posts/1/?page=2 42 ab asgi_0')
+
+    def test_non_ascii_path_is_decoded(self):
+        environ = build_environ({
+            'type': 'http', 'method': 'GET', 'path': '/profile/иван/',
+            'raw_path': b'/profile/%D0%B8%D0%B2%D0%B0%D0%BD/',
+            'query_string': b'page=2',
+        }, b'')
+        request = WSGIRequest(environ)
+        self.assertEqual(request.path, '/profile/иван/')
+        self.assertEqual(
+            resolve(request.path_info).kwargs, {'username': 'иван'})
+        self.assertEqual(
+            environ['RAW_URI'], '/profile/%D0%B8%D0%B2%D0%B0%D0%BD/?page=2')
+
+    def test_repeated_cookie_headers(self):
+        environ = build_environ({
+            'type': 'http', 'method': 'GET', 'path': '/',
+            'headers': [
+                (b'cookie', b'sessionid=abc'), (b'cookie', b'csrftoken=xyz'),
+                (b'accept', b'text/html'), (b'accept', b'*/*'),
+            ],
+        }, b'')
+        request = WSGIRequest(environ)
+        self.assertEqual(
+            request.COOKIES, {'sessionid': 'abc', 'csrftoken': 'xyz'})
+        self.assertEqual(environ['HTTP_ACCEPT'], 'text/html,*/*')
+
+
+class TemplateWarmupTests(SimpleTestCase):
+    def test_project_templates_compile(self):
+        names = template_names()
+        self.assertIn('includes/post.html', names)
+        self.assertEqual(warm_up(names), {})
+
+    def test_cached_loader_is_filled(self):
+        cached = {
+            **settings.TEMPLATES[0],
+            'OPTIONS': {
+                **settings.TEMPLATES[0]['OPTIONS'],
+                'loaders': [(
+                    'django.template.loaders.cached.Loader',
+                    settings.TEMPLATE_LOADERS,
+                )],
+            },
+        }
+        with override_settings(TEMPLATES=[cached]):
+            warm_up(['base.html', 'includes/post.html'])
+            loader = engines['django'].engine.template_loaders[0]
+            self.assertIn('includes/post.html', loader.get_template_cache)
@@ -1,5 +1,8 @@
 from http import HTTPStatus
 
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from django.http import JsonResponse
 from django.shortcuts import render
 
 
@@ -13,3 +16,35 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html', status=HTTPStatus.FORBIDDEN)
+
+
+def health(request):
+    """Проверка живости для балансировщика: базы и кэш."""
+    report = {'databases': {}, 'cache': 'ok'}
+    healthy = True
+    for connection in connections.all():
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                if connection.vendor == 'sqlite':
+                    cursor.execute('PRAGMA journal_mode')
+                    report['databases'][connection.alias] = (
+                        cursor.fetchone()[0]
+                    )
+                else:
+                    report['databases'][connection.alias] = 'ok'
+        except DatabaseError as error:
+            report['databases'][connection.alias] = str(error)
+            healthy = False
+    try:
+        cache.set('health', 1, 10)
+        if cache.get('health') != 1:
+            raise ValueError('значение не сохранилось')
+    except Exception as error:
+        report['cache'] = str(error)
+        healthy = False
+    report['status'] = 'ok' if healthy else 'error'
+    return JsonResponse(
+        report,
+        status=HTTPStatus.OK if healthy else HTTPStatus.SERVICE_UNAVAILABLE,
+    )
@@ -0,0 +1,133 @@
+"""Read-only JSON API лент.
+
+Те же выборки, что и у HTML-страниц (for_feed, лента подписок),
+keyset-пагинация по ?cursor= и условные ответы: клиент с актуальным
+ETag получает 304 без выборки и сериализации.
+"""
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+
+from . import feed
+from .conditional import (
+    SITE, author_versions, feed_condition, feed_state, group_versions,
+)
+from .models import Comment, Follow, Group, Post, User
+from .paginators import CursorPaginator
+from .views import PAGI_PAGE, comments_page
+
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+def serialize_post(post):
+    return {
+        'id': post.id,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.id,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created,
+    }
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params=JSON_PARAMS)
+
+
+def feed_response(request, queryset):
+    page = CursorPaginator(queryset, PAGI_PAGE).get_page(
+        request.GET.get('cursor')
+    )
+    return json_response({
+        'results': [serialize_post(post) for post in page],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    })
+
+
+def followed_posts(user):
+    if settings.POSTS_FEED_FANOUT:
+        return feed.followed_posts(user)
+    return Post.objects.for_feed().filter(
+        author_id__in=Follow.objects.filter(user=user).values('author_id')
+    )
+
+
+def index_state(request):
+    return feed_state(request, versions=(SITE,))
+
+
+def group_state(request, slug):
+    return feed_state(request, versions=group_versions(slug))
+
+
+def profile_state(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'id', flat=True).first()
+    return feed_state(request, versions=author_versions(author_id))
+
+
+def post_state(request, post_id):
+    comments = Comment.objects.filter(post_id=post_id).aggregate(
+        count=Count('id'), newest=Max('created')
+    )
+    return feed_state(
+        request,
+        comments['count'],
+        comments['newest'],
+        versions=(SITE, ('post', post_id)),
+    )
+
+
+def follow_state(request):
+    return feed_state(request, versions=(
+        SITE, ('follows', request.user.pk or 0)
+    ))
+
+
+@feed_condition(index_state)
+def index(request):
+    return feed_response(request, Post.objects.for_feed())
+
+
+@feed_condition(group_state)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, group.posts.for_feed())
+
+
+@feed_condition(profile_state)
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, author.posts.for_feed())
+
+
+@feed_condition(post_state)
+def post_detail(request, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), id=post_id
+    )
+    comments = comments_page(post.id, request.GET.get('cursor'))
+    return json_response({
+        'post': serialize_post(post),
+        'comments': [serialize_comment(comment) for comment in comments],
+        'next_cursor': comments.next_cursor,
+        'previous_cursor': comments.previous_cursor,
+    })
+
+
+@feed_condition(follow_state)
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return json_response({'detail': 'Нужна авторизация'}, status=401)
+    return feed_response(request, followed_posts(request.user))
@@ -0,0 +1,126 @@
+"""Версии объектов для ключей кэша.
+
+Версия хранится в кэше как счётчик и сдвигается при каждом изменении
+объекта, поэтому старые фрагменты просто перестают находиться по новому
+ключу. Пропавший из кэша счётчик начинается заново с метки времени,
+чтобы не совпасть ни с одним из прежних значений.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+LOCK_TIMEOUT = 30
+
+
+def version_key(kind, pk):
+    return f'version:{kind}:{pk}'
+
+
+def _fresh_version():
+    return time.time_ns() // 1000
+
+
+def bump_version(kind, pk):
+    key = version_key(kind, pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_version(), None)
+
+
+def get_versions(*objects):
+    """Версии для пар (kind, pk) одним обращением к кэшу."""
+    keys = [version_key(kind, pk) for kind, pk in objects]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _fresh_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_post_lists(author_ids=(), group_ids=()):
+    """Сдвигает версии списков постов авторов и групп: на них держатся
+    ETag профиля и страницы группы."""
+    for author_id in set(author_ids) - {None}:
+        bump_version('author_posts', author_id)
+    for group_id in set(group_ids) - {None}:
+        bump_version('group_posts', group_id)
+
+
+def card_version(post):
+    """Версия карточки поста: меняется с постом, группой и автором."""
+    return '.'.join(map(str, get_versions(
+        ('post', post.pk),
+        ('group', post.group_id),
+        ('user', post.author_id),
+    )))
+
+
+def feed_key(namespace, request):
+    """Ключ кэша страницы ленты для этого пути и пользователя."""
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'feed:{namespace}:{request.user.pk or 0}:{path}'
+
+
+def lock_key(key):
+    """Ключ блокировки перерисовки страницы с ключом key."""
+    return f'{key}:lock'
+
+
+def _cached_response(entry):
+    response = HttpResponse(
+        entry['content'], content_type=entry['content_type']
+    )
+    response['X-Feed-Cache'] = entry['state']
+    return response
+
+
+def cached_feed(namespace):
+    """Кэш страницы ленты, сбрасываемый событиями, а не по таймеру.
+
+    Страница хранится вместе с поколением ленты; сигналы сдвигают
+    поколение при изменении постов. Устаревшую страницу
+    перерисовывает только один воркер (блокировка через cache.add),
+    остальные тем временем отдают устаревшую копию. Если копии нет
+    совсем, воркер один раз коротко ждёт чужой перерисовки и потом
+    рисует страницу сам, не занимая поток ожиданием.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            generation = get_versions(('feed', namespace))[0]
+            key = feed_key(namespace, request)
+            lock = lock_key(key)
+            entry = cache.get(key)
+            if entry and entry['generation'] == generation:
+                return _cached_response(dict(entry, state='hit'))
+            locked = cache.add(lock, True, LOCK_TIMEOUT)
+            if not locked and entry:
+                return _cached_response(dict(entry, state='stale'))
+            if not locked:
+                time.sleep(settings.POSTS_FEED_CACHE_WAIT)
+                entry = cache.get(key)
+                if entry:
+                    return _cached_response(dict(entry, state='hit'))
+            try:
+                response = view(request, *args, **kwargs)
+                response['X-Feed-Cache'] = 'miss'
+                if response.status_code == 200 and not response.streaming:
+                    cache.set(key, {
+                        'generation': generation,
+                        'content': response.content,
+                        'content_type': response['Content-Type'],
+                    }, settings.POSTS_FEED_CACHE_TIMEOUT)
+            finally:
+                if locked:
+                    cache.delete(lock)
+            return response
+        return wrapper
+    return decorator
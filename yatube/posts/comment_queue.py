@@ -0,0 +1,124 @@
+"""Запись комментариев через очередь (write-behind).
+
+На SQLite каждый INSERT берёт блокировку записи на всю базу, поэтому
+при наплыве комментариев запросы выстраиваются друг за другом. Фоновый
+поток собирает комментарии за POSTS_COMMENT_FLUSH_INTERVAL в одну
+транзакцию с bulk_create. В режиме 'commit' запрос ждёт коммита своей
+пачки (групповой коммит), в режиме 'queued' отвечает сразу.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from core.routers import primary
+
+from . import trending
+from .models import AuthorStats, Comment
+
+logger = logging.getLogger(__name__)
+
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def flush(comments):
+    """Сохраняет пачку одной транзакцией.
+
+    bulk_create не шлёт post_save, поэтому счётчики и популярность
+    постов обновляются здесь.
+    """
+    with primary(), transaction.atomic():
+        Comment.objects.bulk_create(comments)
+        authors = Counter(comment.author_id for comment in comments)
+        for author_id, count in authors.items():
+            AuthorStats.objects.bump(author_id, 'comments_count', count)
+        trending.comments_added(comments)
+
+
+def _next_batch():
+    batch = [_queue.get()]
+    deadline = time.monotonic() + settings.POSTS_COMMENT_FLUSH_INTERVAL
+    while len(batch) < settings.POSTS_COMMENT_BATCH:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(_queue.get(timeout=timeout))
+        except queue.Empty:
+            break
+    return batch
+
+
+def _write(batch):
+    try:
+        flush([comment for comment, _ in batch])
+    except Exception as error:
+        logger.exception('Не удалось сохранить %s комментариев', len(batch))
+        for _, future in batch:
+            future.set_exception(error)
+    else:
+        for _, future in batch:
+            future.set_result(None)
+    finally:
+        close_old_connections()
+
+
+def _run():
+    while True:
+        _write(_next_batch())
+
+
+def _start_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(
+                target=_run, name='comment-writer', daemon=True
+            )
+            _worker.start()
+
+
+@atexit.register
+def drain():
+    """Дописывает остаток очереди при штатной остановке процесса."""
+    batch = []
+    while True:
+        try:
+            batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    if batch:
+        _write(batch)
+
+
+def submit(comment):
+    """Сохраняет комментарий сразу или через очередь.
+
+    Возвращает True, если комментарий уже записан в базу. False — он
+    в очереди и будет записан позже: в режиме 'queued' или когда коммит
+    пачки не дождались за POSTS_COMMENT_COMMIT_TIMEOUT. Повторять запрос
+    не нужно.
+    """
+    if not settings.POSTS_COMMENT_WRITE_BEHIND:
+        comment.save()
+        return True
+    _start_worker()
+    future = Future()
+    _queue.put((comment, future))
+    if settings.POSTS_COMMENT_DURABILITY != 'commit':
+        return False
+    try:
+        future.result(timeout=settings.POSTS_COMMENT_COMMIT_TIMEOUT)
+    except FutureTimeoutError:
+        logger.warning('Комментарий ещё в очереди после таймаута')
+        return False
+    return True
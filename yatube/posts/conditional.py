@@ -0,0 +1,58 @@
+"""Условные ответы (ETag) для лент.
+
+Валидатор считается до основной выборки из счётчиков версий caching.
+Главная лента и пост зависят от поколения ('feed', 'index'), которое
+сигналы сдвигают при любом изменении постов, групп и авторов. Страницы
+группы и автора зависят только от версий своего списка постов
+('group_posts', 'author_posts'), поэтому чужие посты их 304 не сбивают.
+Last-Modified не отдаётся: дата самого свежего поста не меняется при
+правке или удалении, и клиент с одним If-Modified-Since получал бы 304
+со старым содержимым.
+"""
+import hashlib
+
+from django.views.decorators.http import condition
+
+from . import caching
+from .models import Group
+
+SITE = ('feed', 'index')
+# Сдвигается после массовых загрузок без сигналов.
+POST_LISTS = ('post_lists', 'all')
+
+
+def feed_state(request, *parts, versions=()):
+    """Общие для всех лент части валидатора и версии одним обращением
+    к кэшу; версия зрителя — за его имя в шапке."""
+    viewer = request.user.pk or 0
+    return (
+        request.get_full_path(),
+        viewer,
+        *caching.get_versions(('user', viewer), *versions),
+        *parts,
+    )
+
+
+def group_versions(slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'id', flat=True).order_by().first()
+    return ('group', group_id), ('group_posts', group_id), POST_LISTS
+
+
+def author_versions(author_id):
+    return ('user', author_id), ('author_posts', author_id), POST_LISTS
+
+
+def feed_condition(state):
+    """Оборачивает view в condition() с ETag из state().
+
+    state(request, *args, **kwargs) возвращает части валидатора;
+    считается один раз на запрос.
+    """
+    def etag(request, *args, **kwargs):
+        if not hasattr(request, '_feed_etag'):
+            raw = ':'.join(map(str, state(request, *args, **kwargs)))
+            request._feed_etag = hashlib.md5(raw.encode()).hexdigest()
+        return request._feed_etag
+
+    return condition(etag_func=etag)
@@ -0,0 +1,176 @@
+"""Материализованная лента подписок (fan-out-on-write).
+
+Новый пост раскладывается по FeedEntry подписчиков автора, поэтому
+лента подписок читается одним диапазоном индекса (user, -pub_date,
+-post) по собственной дате записи, а посты выбираются потом по id.
+Посты авторов, у которых подписчиков больше
+POSTS_FEED_FANOUT_MAX_FOLLOWERS, не раскладываются, а подмешиваются
+при чтении (fan-out-on-read). Когда автор пересекает порог, его записи
+в лентах удаляются или раскладываются заново (followers_changed).
+"""
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import AuthorStats, FeedEntry, Follow, Post
+from .paginators import PREVIOUS
+
+
+def is_celebrity(author_id):
+    limit = settings.POSTS_FEED_FANOUT_MAX_FOLLOWERS
+    if limit is None:
+        return False
+    return AuthorStats.objects.filter(
+        user_id=author_id, followers_count__gt=limit
+    ).exists()
+
+
+def fan_out(post):
+    """Раскладывает пост по лентам подписчиков пачками."""
+    if not post.author_id or is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).iterator()
+    batch_size = settings.POSTS_FEED_FANOUT_BATCH
+    while True:
+        batch = list(islice(followers, batch_size))
+        if not batch:
+            break
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+                for user_id in batch
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту нового подписчика последние посты автора."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'id', 'pub_date'
+    )[:settings.POSTS_FEED_BACKFILL_LIMIT]
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts
+        ],
+        batch_size=settings.POSTS_FEED_FANOUT_BATCH,
+        ignore_conflicts=True,
+    )
+
+
+def prune(user_id, author_id):
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def followers_changed(author_id, delta):
+    """Переводит автора между раскладкой при записи и при чтении.
+
+    Посты звезды подмешиваются при чтении, и её записи в лентах
+    удаляются, чтобы не задвоить ленту. Автору, опустившемуся ниже
+    порога, раскладываются и посты, вышедшие, пока он был звездой.
+    """
+    limit = settings.POSTS_FEED_FANOUT_MAX_FOLLOWERS
+    if limit is None:
+        return
+    count = AuthorStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True
+    ).first()
+    if count is None:
+        return
+    if count - delta <= limit < count:
+        FeedEntry.objects.filter(post__author_id=author_id).delete()
+    elif count <= limit < count - delta:
+        followers = Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True)
+        for user_id in followers.iterator():
+            backfill(user_id, author_id)
+
+
+def _after(queryset, pk, value, pk_value, newer):
+    lookup = 'gt' if newer else 'lt'
+    return queryset.filter(
+        Q(**{f'pub_date__{lookup}': value})
+        | Q(pub_date=value, **{f'{pk}__{lookup}': pk_value})
+    )
+
+
+class FollowedPosts:
+    """Лента подписок для Paginator и CursorPaginator.
+
+    Ключи (pub_date, id поста) идут диапазоном индекса FeedEntry, посты
+    звёзд — индекса Post (author, -pub_date, -id); потоки сливаются
+    по ключу, и страница постов выбирается одним запросом по id.
+    """
+
+    ordered = True
+
+    def __init__(self, user):
+        self.sources = [(FeedEntry.objects.filter(user=user), 'post_id')]
+        limit = settings.POSTS_FEED_FANOUT_MAX_FOLLOWERS
+        if limit is not None:
+            celebrities = list(AuthorStats.objects.filter(
+                user_id__in=Follow.objects.filter(
+                    user=user).values('author_id'),
+                followers_count__gt=limit,
+            ).values_list('user_id', flat=True))
+            if celebrities:
+                self.sources.append(
+                    (Post.objects.filter(author_id__in=celebrities), 'id')
+                )
+
+    def count(self):
+        return sum(queryset.count() for queryset, _ in self.sources)
+
+    def __len__(self):
+        return self.count()
+
+    def keys(self, stop, start=0, position=None):
+        """Ключи с start по stop; position — (newer, pub_date, id)."""
+        newer = position is not None and position[0]
+        streams = []
+        for queryset, pk in self.sources:
+            if position is not None:
+                queryset = _after(queryset, pk, *position[1:], newer)
+            order = ('pub_date', pk) if newer else ('-pub_date', f'-{pk}')
+            rows = queryset.order_by(*order).values_list('pub_date', pk)
+            if len(self.sources) == 1:
+                return list(rows[start:stop])
+            streams.append(rows[:stop])
+        merged, last = [], None
+        for key in heapq.merge(*streams, reverse=not newer):
+            # Звезда могла остаться в лентах после смены порога.
+            if key != last:
+                merged.append(key)
+            last = key
+        return merged[start:stop]
+
+    def posts(self, keys):
+        posts = Post.objects.for_feed().in_bulk([pk for _, pk in keys])
+        return [posts[pk] for _, pk in keys if pk in posts]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.posts(self.keys(index.stop, index.start or 0))
+        return self.posts(self.keys(index + 1, index))[0]
+
+    def keyset(self, position, limit):
+        """Страница для CursorPaginator в порядке выборки."""
+        if position is not None:
+            direction, value, pk = position
+            position = (direction == PREVIOUS, value, pk)
+        return self.posts(self.keys(limit, position=position))
+
+
+def followed_posts(user):
+    """Посты авторов, на которых подписан пользователь."""
+    return FollowedPosts(user)
@@ -0,0 +1,89 @@
+"""Граф подписок: множества id подписок и подписчиков в кэше.
+
+Вопросы «подписан ли A на B», «на кого подписан A» и «взаимные
+подписки» решаются операциями над множествами без JOIN по Follow.
+Множество грузится из основной базы одним запросом по индексу при
+промахе. Сигналы Follow не правят закэшированные множества на месте
+(чтение-правка-запись гонялось бы между процессами), а сдвигают версии
+обоих множеств ребра: следующее чтение загрузит их заново. Массовые
+вставки без сигналов сбрасывают весь граф через reset().
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.routers import primary
+
+from . import caching
+from .models import Follow
+
+FOLLOWEES = 'followees'
+FOLLOWERS = 'followers'
+
+
+def _key(kind, user_id):
+    generation, version = caching.get_versions(
+        ('follow_graph', 'all'), (kind, user_id)
+    )
+    return f'follow:{kind}:{generation}.{version}:{user_id}'
+
+
+def reset():
+    caching.bump_version('follow_graph', 'all')
+
+
+def _load(kind, user_id):
+    if kind == FOLLOWEES:
+        rows = Follow.objects.filter(user_id=user_id).values_list(
+            'author_id', flat=True)
+    else:
+        rows = Follow.objects.filter(author_id=user_id).values_list(
+            'user_id', flat=True)
+    # Реплика может отставать, а множество живёт в кэше долго.
+    with primary():
+        return frozenset(rows)
+
+
+def _ids(kind, user_id):
+    if not user_id:
+        return frozenset()
+    key = _key(kind, user_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = _load(kind, user_id)
+        cache.set(key, ids, settings.POSTS_FOLLOW_GRAPH_TIMEOUT)
+    return ids
+
+
+def followee_ids(user_id):
+    """На кого подписан пользователь."""
+    return _ids(FOLLOWEES, user_id)
+
+
+def follower_ids(user_id):
+    """Кто подписан на пользователя."""
+    return _ids(FOLLOWERS, user_id)
+
+
+def is_following(user_id, author_id):
+    return author_id in followee_ids(user_id)
+
+
+def mutual_ids(user_id):
+    """Пользователи, с которыми подписка взаимная."""
+    return followee_ids(user_id) & follower_ids(user_id)
+
+
+def _invalidate(user_id, author_id):
+    caching.bump_version(FOLLOWEES, user_id)
+    caching.bump_version(FOLLOWERS, author_id)
+
+
+def update(user_id, author_id):
+    """Сбрасывает оба множества ребра.
+
+    Версии сдвигаются сразу и ещё раз после коммита: множество,
+    загруженное до коммита без нового ребра, не переживёт транзакцию.
+    """
+    _invalidate(user_id, author_id)
+    transaction.on_commit(lambda: _invalidate(user_id, author_id))
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.asgi import WSGIToASGI, build_environ, run_wsgi
+from posts.models import Group, Post, User
+from posts.seeding import benchmark_database, percentiles, seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает WSGI с фиксированным числом потоков и ASGI-обёртку '
+        'при множестве одновременных медленных клиентов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=5)
+        parser.add_argument(
+            '--threads', type=int, default=settings.ASGI_THREADS,
+            help='Потоков у WSGI-сервера и в пуле ASGI-обёртки',
+        )
+        parser.add_argument(
+            '--client-delay', type=float, default=50,
+            help='Сколько мс клиент передаёт запрос (медленная сеть)',
+        )
+        parser.add_argument(
+            '--parallel-fetch', action='store_true',
+            help='Включить POSTS_PARALLEL_FETCH',
+        )
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        parallel = override_settings(
+            POSTS_PARALLEL_FETCH=options['parallel_fetch']
+        )
+        with parallel, benchmark_database(keepdb=options['keepdb']):
+            if not Post.objects.exists():
+                seed(users=500, groups=20, posts=options['posts'],
+                     comments=options['posts'], follows=5000,
+                     log=self.stdout.write)
+            urls = self.urls()
+            handler = WSGIHandler()
+            total = options['clients'] * options['requests']
+            for name, run in (('wsgi', self.run_wsgi),
+                              ('asgi', self.run_asgi)):
+                started = time.perf_counter()
+                latencies = run(handler, urls, options)
+                elapsed = time.perf_counter() - started
+                p50, p95 = percentiles(latencies, 50, 95)
+                self.stdout.write(
+                    f'{name}: {total / elapsed:8.1f} запросов/с  '
+                    f'p50 {p50:8.1f} мс  p95 {p95:8.1f} мс'
+                )
+
+    def urls(self):
+        usernames = User.objects.values_list('username', flat=True)[:50]
+        slugs = Group.objects.values_list('slug', flat=True)[:20]
+        post_ids = Post.objects.values_list('id', flat=True)[:50]
+        return (
+            [reverse('posts:profile', args=[name]) for name in usernames]
+            + [reverse('posts:group_list', args=[slug]) for slug in slugs]
+            + [reverse('posts:post_detail', args=[pk]) for pk in post_ids]
+            + [reverse('posts:index')]
+        )
+
+    @staticmethod
+    def scope(path):
+        return {
+            'type': 'http', 'method': 'GET', 'path': path,
+            'query_string': b'', 'headers': [(b'host', b'localhost')],
+            'server': ('localhost', 80),
+        }
+
+    def run_wsgi(self, handler, urls, options):
+        # Поток WSGI-сервера занят, пока клиент передаёт запрос;
+        # клиенты сверх числа потоков ждут в очереди.
+        delay = options['client_delay'] / 1000
+        slots = threading.BoundedSemaphore(options['threads'])
+
+        def client(number):
+            latencies = []
+            for step in range(options['requests']):
+                path = urls[(number * options['requests'] + step) % len(urls)]
+                started = time.perf_counter()
+                with slots:
+                    time.sleep(delay)
+                    run_wsgi(handler, build_environ(self.scope(path), b''))
+                latencies.append((time.perf_counter() - started) * 1000)
+            return latencies
+
+        with ThreadPoolExecutor(options['clients']) as executor:
+            results = executor.map(client, range(options['clients']))
+            return [latency for latencies in results for latency in latencies]
+
+    def run_asgi(self, handler, urls, options):
+        # Медленный клиент занимает только корутину, а не поток.
+        delay = options['client_delay'] / 1000
+        app = WSGIToASGI(handler, max_workers=options['threads'])
+
+        async def request(number):
+            async def receive():
+                await asyncio.sleep(delay)
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                pass
+
+            started = time.perf_counter()
+            await app(self.scope(urls[number % len(urls)]), receive, send)
+            return (time.perf_counter() - started) * 1000
+
+        async def client(number):
+            return [
+                await request(number * options['requests'] + step)
+                for step in range(options['requests'])
+            ]
+
+        async def main():
+            results = await asyncio.gather(
+                *(client(number) for number in range(options['clients']))
+            )
+            return [latency for latencies in results for latency in latencies]
+
+        try:
+            return asyncio.run(main())
+        finally:
+            app.executor.shutdown()
@@ -0,0 +1,101 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.models import Comment, Follow, Post
+from posts.seeding import benchmark_database, seed
+
+INDEXED_MODELS = (Post, Comment, Follow)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает планы и время запросов лент без индексов и с ними '
+        'на временной базе с синтетическими данными'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument('--follows', type=int, default=50000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        with benchmark_database(keepdb=options['keepdb']):
+            if not Post.objects.exists():
+                seed(
+                    users=options['users'],
+                    groups=options['groups'],
+                    posts=options['posts'],
+                    comments=options['comments'],
+                    follows=options['follows'],
+                    rebuild=False,
+                    log=self.stdout.write,
+                )
+            queries = self.hot_queries()
+            self.drop_indexes()
+            try:
+                self.report('Без индексов', queries, options['repeat'])
+            finally:
+                self.create_indexes()
+            self.report('С индексами', queries, options['repeat'])
+
+    def hot_queries(self):
+        post = Post.objects.filter(group__isnull=False).first()
+        comment = Comment.objects.first()
+        follow = Follow.objects.first()
+        return {
+            'index': Post.objects.for_feed()[:10],
+            'group_posts': Post.objects.for_feed().filter(
+                group_id=post.group_id)[:10],
+            'profile': Post.objects.for_feed().filter(
+                author_id=post.author_id)[:10],
+            'comments': Comment.objects.filter(
+                post_id=comment.post_id if comment else post.id)[:10],
+            'follow_lookup': Follow.objects.filter(
+                user_id=follow.user_id if follow else post.author_id,
+                author_id=follow.author_id if follow else post.author_id,
+            )[:1],
+        }
+
+    def drop_indexes(self):
+        with connection.schema_editor() as editor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    editor.remove_index(model, index)
+                constraints = model._meta.constraints
+                # SQLite удаляет ограничение пересборкой таблицы по Meta,
+                # поэтому на время пересборки Meta не должна его содержать.
+                model._meta.constraints = []
+                try:
+                    for constraint in constraints:
+                        editor.remove_constraint(model, constraint)
+                finally:
+                    model._meta.constraints = constraints
+
+    def create_indexes(self):
+        with connection.schema_editor() as editor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    editor.add_index(model, index)
+                for constraint in model._meta.constraints:
+                    editor.add_constraint(model, constraint)
+
+    def report(self, title, queries, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, queryset in queries.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f'{name}: медиана {statistics.median(timings):.2f} мс, '
+                f'максимум {max(timings):.2f} мс'
+            )
+            self.stdout.write(queryset.explain())
@@ -0,0 +1,176 @@
+import json
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Follow, Group, Post, User
+from posts.seeding import benchmark_database, percentiles, seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный замер страниц yatube на синтетических данных: '
+        'перцентили задержки, запросы к БД и аллокации на запрос'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument(
+            '--alloc-requests', type=int, default=20,
+            help='Сколько запросов повторить под tracemalloc',
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом',
+        )
+        parser.add_argument('--output', help='Куда сохранить JSON')
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона для сравнения p95',
+        )
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        self.rnd = random.Random(0)
+        with benchmark_database(keepdb=options['keepdb']):
+            if not Post.objects.exists():
+                seed(
+                    users=options['users'],
+                    groups=options['groups'],
+                    posts=options['posts'],
+                    comments=options['comments'],
+                    follows=options['follows'],
+                    log=self.stdout.write,
+                )
+            self.prepare()
+            results = {
+                name: self.measure(scenario, options)
+                for name, scenario in self.scenarios().items()
+            }
+        report = {
+            'commit': self.commit(),
+            'created': timezone.now().isoformat(),
+            'dataset': {
+                key: options[key]
+                for key in ('users', 'groups', 'posts', 'comments', 'follows')
+            },
+            'cold_cache': options['cold'],
+            'views': results,
+        }
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as source:
+                baseline = json.load(source)['views']
+        self.print_report(results, baseline)
+        if options['output']:
+            with open(options['output'], 'w') as target:
+                json.dump(report, target, indent=2, ensure_ascii=False)
+
+    def prepare(self):
+        self.reader = User.objects.filter(
+            id__in=Follow.objects.values('user_id')
+        ).first() or User.objects.first()
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.usernames = list(
+            User.objects.values_list('username', flat=True)[:500])
+        self.slugs = list(Group.objects.values_list('slug', flat=True))
+        self.post_ids = list(Post.objects.values_list('id', flat=True)[:500])
+
+    def scenarios(self):
+        pages = [1, 2, 5, 50]
+
+        def page():
+            return {'page': self.rnd.choice(pages)}
+
+        return {
+            'index': lambda: ('get', reverse('posts:index'), page()),
+            'group_posts': lambda: ('get', reverse(
+                'posts:group_list', args=[self.rnd.choice(self.slugs)]
+            ), page()),
+            'profile': lambda: ('get', reverse(
+                'posts:profile', args=[self.rnd.choice(self.usernames)]
+            ), page()),
+            'post_detail': lambda: ('get', reverse(
+                'posts:post_detail', args=[self.rnd.choice(self.post_ids)]
+            ), {}),
+            'follow_index': lambda: (
+                'get', reverse('posts:follow_index'), page()),
+            'add_comment': lambda: ('post', reverse(
+                'posts:add_comment', args=[self.rnd.choice(self.post_ids)]
+            ), {'text': 'Комментарий из замера'}),
+        }
+
+    def request(self, scenario, cold):
+        method, url, data = scenario()
+        if cold:
+            cache.clear()
+        return getattr(self.client, method)(url, data)
+
+    def measure(self, scenario, options):
+        latencies, queries = [], []
+        for _ in range(options['requests']):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                self.request(scenario, options['cold'])
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+        allocations = []
+        tracemalloc.start()
+        for _ in range(options['alloc_requests']):
+            tracemalloc.clear_traces()
+            self.request(scenario, options['cold'])
+            allocations.append(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+        p50, p95, p99 = percentiles(latencies, 50, 95, 99)
+        return {
+            'requests': len(latencies),
+            'p50_ms': round(p50, 3),
+            'p95_ms': round(p95, 3),
+            'p99_ms': round(p99, 3),
+            'rps': round(1000 * len(latencies) / sum(latencies), 1),
+            'queries_mean': round(statistics.mean(queries), 2),
+            'queries_max': max(queries),
+            'peak_alloc_kib_mean': round(statistics.mean(allocations), 1)
+            if allocations else None,
+        }
+
+    def print_report(self, results, baseline):
+        for name, stats in results.items():
+            line = (
+                f'{name:>13}: p50 {stats["p50_ms"]:8.2f} мс  '
+                f'p95 {stats["p95_ms"]:8.2f} мс  '
+                f'p99 {stats["p99_ms"]:8.2f} мс  '
+                f'запросов {stats["queries_mean"]:6.2f}  '
+                f'аллокации {stats["peak_alloc_kib_mean"]} КиБ'
+            )
+            if baseline and name in baseline:
+                before = baseline[name]['p95_ms']
+                change = 100 * (stats['p95_ms'] - before) / before
+                line += f'  p95 {change:+.1f}%'
+            self.stdout.write(line)
+
+    @staticmethod
+    def commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
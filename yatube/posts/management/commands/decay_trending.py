@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Затухание счётов популярности и удаление остывших строк; '
+        'запускается раз в POSTS_TRENDING_DECAY_INTERVAL секунд'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--elapsed', type=float,
+            default=settings.POSTS_TRENDING_DECAY_INTERVAL,
+            help='Сколько секунд прошло с прошлого запуска',
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Пересчитать таблицу по свежим постам и комментариям',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            created = trending.rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                f'Популярность пересчитана: {created} постов'
+            ))
+            return
+        updated, removed = trending.decay(options['elapsed'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено: {updated}, удалено: {removed}'
+        ))
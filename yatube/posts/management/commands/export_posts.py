@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает посты, комментарии или подписки '
+        'в NDJSON или CSV'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', nargs='?', default='-',
+            help='Файл для выгрузки, по умолчанию stdout',
+        )
+        parser.add_argument(
+            '--kind', choices=sorted(transfer.KINDS), default='posts',
+        )
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'), default='ndjson',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько строк читать из курсора за раз',
+        )
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        if options['output'] == '-':
+            self.export(sys.stdout, kind, options)
+        else:
+            with open(options['output'], 'w', newline='',
+                      encoding='utf-8') as target:
+                self.export(target, kind, options)
+
+    def export(self, stream, kind, options):
+        records = transfer.write_records(
+            transfer.export_rows(kind, options['chunk_size']),
+            stream, options['format'], transfer.KINDS[kind]['fields'],
+        )
+        for _ in transfer.with_progress(
+            records, self.stderr.write, every=options['chunk_size'] * 50
+        ):
+            pass
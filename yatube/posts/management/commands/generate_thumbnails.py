@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Готовит миниатюры всех размеров для картинок постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перегенерировать и уже готовые миниатюры',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').values_list('id', 'image')
+        generated = 0
+        for post_id, image in posts.iterator():
+            if thumbnails.ready(image) and not options['all']:
+                continue
+            thumbnails.generate(post_id, force=options['all'])
+            generated += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Подготовлены миниатюры для {generated} постов'
+        ))
@@ -0,0 +1,89 @@
+import sys
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from posts import caching, follow_graph, search, transfer, trending
+from posts.models import Comment, Post
+from posts.seeding import batched, explicit_dates
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково загружает посты, комментарии или подписки '
+        'из NDJSON или CSV пачками bulk_create'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input', nargs='?', default='-',
+            help='Файл с выгрузкой, по умолчанию stdin',
+        )
+        parser.add_argument(
+            '--kind', choices=sorted(transfer.KINDS), default='posts',
+        )
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'), default='ndjson',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Строк в одном bulk_create и одной транзакции',
+        )
+        parser.add_argument(
+            '--ignore-conflicts', action='store_true',
+            help='Пропускать строки, которые уже есть в базе',
+        )
+        parser.add_argument(
+            '--skip-rebuild', action='store_true',
+            help='Не пересчитывать счётчики, ленты и поисковый индекс',
+        )
+
+    def handle(self, *args, **options):
+        if options['input'] == '-':
+            self.load(sys.stdin, options)
+        else:
+            with open(options['input'], newline='',
+                      encoding='utf-8') as source:
+                self.load(source, options)
+        if not options['skip_rebuild']:
+            self.rebuild()
+
+    def load(self, stream, options):
+        kind = options['kind']
+        model = transfer.KINDS[kind]['model']
+        users, groups = transfer.user_map(), transfer.group_map()
+        records = transfer.with_progress(
+            transfer.read_records(stream, options['format']),
+            self.stderr.write, every=options['batch_size'] * 50,
+        )
+        with explicit_dates(Post._meta.get_field('pub_date'),
+                            Comment._meta.get_field('created')):
+            for batch in batched(records, options['batch_size']):
+                with transaction.atomic():
+                    model.objects.bulk_create(
+                        transfer.build_objects(kind, batch, users, groups),
+                        ignore_conflicts=options['ignore_conflicts'],
+                    )
+        # Явные id не двигают последовательности PostgreSQL.
+        statements = connection.ops.sequence_reset_sql(no_style(), [model])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def rebuild(self):
+        # bulk_create не шлёт сигналы: производные таблицы и кэш
+        # пересчитываются одним проходом в конце.
+        call_command('rebuild_author_stats', stdout=StringIO())
+        call_command('rebuild_feeds', stdout=StringIO())
+        if search.available():
+            search.rebuild()
+        trending.rebuild()
+        caching.bump_version('feed', 'index')
+        caching.bump_version('post_lists', 'all')
+        follow_graph.reset()
+        self.stdout.write(self.style.SUCCESS(
+            'Счётчики, ленты, популярность и поиск пересчитаны'
+        ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import AuthorStats, Comment, Follow, Post, User
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики AuthorStats по исходным таблицам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        counters = {
+            'posts_count': Post.objects.filter(
+                author__isnull=False).values_list('author'),
+            'comments_count': Comment.objects.values_list('author'),
+            'followers_count': Follow.objects.values_list('author'),
+            'following_count': Follow.objects.values_list('user'),
+        }
+        counts = {}
+        for field, queryset in counters.items():
+            grouped = queryset.annotate(total=Count('id')).order_by()
+            for user_id, total in grouped:
+                counts.setdefault(user_id, {})[field] = total
+        with transaction.atomic():
+            AuthorStats.objects.all().delete()
+            AuthorStats.objects.bulk_create(
+                (
+                    AuthorStats(user_id=user_id, **counts.get(user_id, {}))
+                    for user_id in User.objects.values_list(
+                        'id', flat=True).iterator()
+                ),
+                batch_size=options['batch_size'],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитана статистика {AuthorStats.objects.count()} авторов'
+        ))
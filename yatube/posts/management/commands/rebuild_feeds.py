@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import feed
+from posts.models import FeedEntry, Follow
+
+
+class Command(BaseCommand):
+    help = 'Заново раскладывает посты по лентам подписок (FeedEntry)'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            FeedEntry.objects.all().delete()
+            follows = Follow.objects.values_list('user_id', 'author_id')
+            for user_id, author_id in follows.iterator():
+                feed.backfill(user_id, author_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей в лентах: {FeedEntry.objects.count()}'
+        ))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации подписок (друзья друзей и '
+        'соподписчики) по всей таблице Follow в памяти'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=10,
+            help='Сколько рекомендаций хранить на пользователя',
+        )
+        parser.add_argument(
+            '--max-followers', type=int, default=1000,
+            help='Авторы с большим числом подписчиков не дают соподписчиков',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        created = suggestions.rebuild(
+            limit=options['limit'],
+            max_followers=options['max_followers'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Рекомендаций: {created} за '
+            f'{time.perf_counter() - started:.1f} с'
+        ))
@@ -0,0 +1,73 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:36
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_feed_entries(apps, schema_editor):
+    """Те же границы, что у feed.backfill: последние
+    POSTS_FEED_BACKFILL_LIMIT постов автора, без звёзд."""
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    FeedEntry = apps.get_model('posts', 'FeedEntry')
+    db_alias = schema_editor.connection.alias
+    follows = Follow.objects.using(db_alias)
+    authors = follows.values('author_id').annotate(followers=Count('id'))
+    limit = settings.POSTS_FEED_FANOUT_MAX_FOLLOWERS
+    if limit is not None:
+        # Посты звёзд подмешиваются при чтении.
+        authors = authors.filter(followers__lte=limit)
+    for author_id in [row['author_id'] for row in authors]:
+        posts = list(
+            Post.objects.using(db_alias).filter(author_id=author_id)
+            .order_by('-pub_date', '-id')
+            .values_list('id', 'pub_date')[:settings.POSTS_FEED_BACKFILL_LIMIT]
+        )
+        followers = follows.filter(author_id=author_id).values_list(
+            'user_id', flat=True)
+        for user_id in followers.iterator():
+            FeedEntry.objects.using(db_alias).bulk_create(
+                [
+                    FeedEntry(
+                        user_id=user_id, post_id=post_id, pub_date=pub_date)
+                    for post_id, pub_date in posts
+                ],
+                batch_size=settings.POSTS_FEED_FANOUT_BATCH,
+                ignore_conflicts=True,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0013_authorstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='posts.Post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'запись ленты подписок',
+                'verbose_name_plural': 'записи ленты подписок',
+                'ordering': ('-pub_date',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='feed_user_pub_date_post_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(fill_feed_entries, migrations.RunPython.noop),
+    ]
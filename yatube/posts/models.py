@@ -18,6 +18,17 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа в том же запросе, только
+        те колонки, которые читает карточка поста."""
+        return self.select_related('author', 'group').only(
+            'text', 'pub_date', 'image', 'author', 'group',
+            'author__username', 'author__first_name', 'author__last_name',
+            'group__slug', 'group__title',
+        )
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name='Текст поста')
     pub_date = models.DateTimeField(auto_now_add=True)
@@ -42,10 +53,26 @@ class Post(models.Model):
         blank=True
     )
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'публикация'
         verbose_name_plural = 'публикации'
+        indexes = [
+            # id — второе поле ключа keyset-пагинации (-pub_date, -id).
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_id_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         chars = 15
@@ -69,6 +96,11 @@ class Comment(models.Model):
     class Meta:
         ordering = ('-created',)
         verbose_name = 'комментарий'
+        indexes = [
+            models.Index(
+                fields=['post', '-created'], name='comment_post_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text
@@ -85,3 +117,168 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following',
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'
+            ),
+        ]
+
+
+class AuthorStatsManager(models.Manager):
+    FIELDS = (
+        'posts_count', 'comments_count', 'followers_count', 'following_count'
+    )
+
+    def counts_for(self, user_id):
+        """Счётчики пользователя, посчитанные по исходным таблицам."""
+        return {
+            'posts_count': Post.objects.filter(author_id=user_id).count(),
+            'comments_count': Comment.objects.filter(
+                author_id=user_id).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=user_id).count(),
+            'following_count': Follow.objects.filter(
+                user_id=user_id).count(),
+        }
+
+    def for_user(self, user):
+        try:
+            return self.get(user_id=user.pk)
+        except self.model.DoesNotExist:
+            stats, _ = self.get_or_create(
+                user_id=user.pk, defaults=self.counts_for(user.pk)
+            )
+            return stats
+
+    def bump(self, user_id, field, delta):
+        """Атомарно сдвигает счётчик; строку без счётчиков создаёт по
+        исходным таблицам, в которых изменение уже учтено."""
+        rows = self.filter(user_id=user_id)
+        if delta < 0:
+            rows = rows.filter(**{f'{field}__gte': -delta})
+        if rows.update(**{field: models.F(field) + delta}) or delta < 0:
+            return
+        self.get_or_create(
+            user_id=user_id, defaults=self.counts_for(user_id)
+        )
+
+
+class AuthorStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    objects = AuthorStatsManager()
+
+    class Meta:
+        verbose_name = 'статистика автора'
+        verbose_name_plural = 'статистика авторов'
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'запись ленты подписок'
+        verbose_name_plural = 'записи ленты подписок'
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_pub_date_post_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_feed_entry'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class FollowSuggestion(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+    )
+    suggested = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    score = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ('-score',)
+        verbose_name = 'рекомендация подписки'
+        verbose_name_plural = 'рекомендации подписок'
+        indexes = [
+            models.Index(
+                fields=['user', '-score'], name='suggestion_user_score_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'suggested'], name='unique_suggestion'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.suggested_id}'
+
+
+class TrendingScore(models.Model):
+    post = models.OneToOneField(
+        Post,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='trending',
+    )
+    # Копия Post.group: топ группы читается по индексу этой таблицы.
+    group = models.ForeignKey(
+        Group,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+    )
+    score = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ('-score',)
+        verbose_name = 'популярность поста'
+        verbose_name_plural = 'популярность постов'
+        indexes = [
+            models.Index(fields=['-score'], name='trending_score_idx'),
+            models.Index(
+                fields=['group', '-score'], name='trending_group_score_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}: {self.score:.2f}'
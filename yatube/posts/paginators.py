@@ -0,0 +1,148 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def page_window(page, on_each_side=2, on_ends=1):
+    """Номера страниц вокруг текущей и по краям; None — пропуск.
+
+    Длина списка не зависит от числа страниц, поэтому пагинатор
+    рисует не больше 2 * (on_each_side + on_ends) + 3 ссылок.
+    """
+    number, last = page.number, page.paginator.num_pages
+    if last <= 2 * (on_each_side + on_ends) + 1:
+        return list(range(1, last + 1))
+    window = []
+    if number > on_each_side + on_ends + 1:
+        window += list(range(1, on_ends + 1)) + [None]
+        start = number - on_each_side
+    else:
+        start = 1
+    if number < last - on_each_side - on_ends:
+        window += list(range(start, number + on_each_side + 1))
+        window += [None] + list(range(last - on_ends + 1, last + 1))
+    else:
+        window += list(range(start, last + 1))
+    return window
+
+
+class CursorPage:
+    """Страница ленты, выбранная по ключу (дата, id) без OFFSET и COUNT."""
+
+    cursor_mode = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<CursorPage of {} objects>'.format(len(self))
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+
+class CursorPaginator:
+    """Keyset-пагинация по паре (field, id) в порядке убывания.
+
+    Стоимость любой страницы равна стоимости первой: выборка идёт
+    по индексу от позиции курсора, общее количество записей не считается.
+    """
+
+    def __init__(self, queryset, per_page, field='pub_date'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.field = field
+
+    def encode_cursor(self, direction, obj):
+        value = getattr(obj, self.field).isoformat()
+        raw = json.dumps([direction, value, obj.pk], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает (direction, value, pk) или None для битого курсора."""
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, value, pk = json.loads(
+                base64.urlsafe_b64decode(padded.encode())
+            )
+            value = parse_datetime(value)
+            pk = int(pk)
+        except (binascii.Error, TypeError, ValueError):
+            return None
+        if direction not in (NEXT, PREVIOUS) or value is None:
+            return None
+        return direction, value, pk
+
+    def fetch(self, position, limit):
+        """Строки от позиции курсора в порядке выборки.
+
+        Вместо QuerySet можно передать объект с методом
+        keyset(position, limit), который выбирает строки сам.
+        """
+        if hasattr(self.queryset, 'keyset'):
+            return self.queryset.keyset(position, limit)
+        field = self.field
+        if position is None:
+            return list(self.queryset.order_by(f'-{field}', '-id')[:limit])
+        direction, value, pk = position
+        if direction == NEXT:
+            return list(
+                self.queryset.filter(
+                    Q(**{f'{field}__lt': value})
+                    | Q(**{field: value, 'id__lt': pk})
+                ).order_by(f'-{field}', '-id')[:limit]
+            )
+        return list(
+            self.queryset.filter(
+                Q(**{f'{field}__gt': value})
+                | Q(**{field: value, 'id__gt': pk})
+            ).order_by(field, 'id')[:limit]
+        )
+
+    def get_page(self, cursor=None):
+        position = self.decode_cursor(cursor)
+        rows = self.fetch(position, self.per_page + 1)
+        if position is not None and position[0] == PREVIOUS:
+            has_next, has_previous = True, len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+        else:
+            has_next = len(rows) > self.per_page
+            has_previous = position is not None
+            rows = rows[:self.per_page]
+        if not rows:
+            return CursorPage(rows)
+        return CursorPage(
+            rows,
+            next_cursor=(
+                self.encode_cursor(NEXT, rows[-1]) if has_next else None
+            ),
+            previous_cursor=(
+                self.encode_cursor(PREVIOUS, rows[0]) if has_previous
+                else None
+            ),
+        )
@@ -0,0 +1,165 @@
+"""Синтетические данные для замеров производительности.
+
+Строки вставляются через bulk_create пачками, поэтому сигналы не
+срабатывают: производные таблицы (AuthorStats, FeedEntry, поиск)
+пересчитываются отдельными командами в конце.
+"""
+import math
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from io import StringIO
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from faker import Faker
+
+from . import follow_graph, search, trending
+from .models import Comment, Follow, Group, Post, User
+
+TEXT_POOL_SIZE = 500
+SEED_PERIOD = timedelta(days=365)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключает auto_now_add, чтобы bulk_create сохранил даты как есть."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now_add in saved:
+            field.auto_now_add = auto_now_add
+
+
+@contextmanager
+def benchmark_database(keepdb=False):
+    """Временная тестовая база, чтобы замеры не трогали рабочую."""
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, keepdb=keepdb
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(
+            old_name, verbosity=0, keepdb=keepdb
+        )
+
+
+def percentiles(values, *percents):
+    """Перцентили методом ближайшего ранга по несортированным values."""
+    ordered = sorted(values)
+    return [
+        ordered[max(math.ceil(len(ordered) * percent / 100) - 1, 0)]
+        for percent in percents
+    ]
+
+
+def seed(users=100, groups=10, posts=1000, comments=0, follows=0,
+         batch_size=10000, rebuild=True, log=None, seed_value=0):
+    """Заполняет базу случайными данными; возвращает id созданных строк."""
+    fake = Faker('ru_RU')
+    Faker.seed(seed_value)
+    rnd = random.Random(seed_value)
+    log = log or (lambda message: None)
+    texts = [fake.paragraph(nb_sentences=5) for _ in range(TEXT_POOL_SIZE)]
+    now = timezone.now()
+    password = make_password(None)
+
+    def random_date():
+        return now - SEED_PERIOD * rnd.random()
+
+    first_user = User.objects.count()
+    for batch in batched(range(users), batch_size):
+        User.objects.bulk_create(
+            User(
+                username=f'{fake.user_name()}_{first_user + number}',
+                first_name=fake.first_name(),
+                last_name=fake.last_name(),
+                password=password,
+            )
+            for number in batch
+        )
+    user_ids = list(User.objects.values_list('id', flat=True))
+    log(f'Пользователей: {len(user_ids)}')
+
+    first_group = Group.objects.count()
+    Group.objects.bulk_create(
+        Group(
+            title=fake.catch_phrase(),
+            slug=f'group-{first_group + number}',
+            description=rnd.choice(texts),
+        )
+        for number in range(groups)
+    )
+    group_ids = list(Group.objects.values_list('id', flat=True))
+    log(f'Групп: {len(group_ids)}')
+
+    created = 0
+    with explicit_dates(Post._meta.get_field('pub_date')):
+        for batch in batched(range(posts), batch_size):
+            Post.objects.bulk_create(
+                Post(
+                    text=rnd.choice(texts),
+                    author_id=rnd.choice(user_ids),
+                    group_id=(
+                        rnd.choice(group_ids)
+                        if group_ids and rnd.random() < 0.7 else None
+                    ),
+                    pub_date=random_date(),
+                )
+                for _ in batch
+            )
+            created += len(batch)
+            log(f'Постов: {created}')
+    post_ids = list(Post.objects.values_list('id', flat=True))
+
+    with explicit_dates(Comment._meta.get_field('created')):
+        for batch in batched(range(comments), batch_size):
+            Comment.objects.bulk_create(
+                Comment(
+                    text=rnd.choice(texts),
+                    author_id=rnd.choice(user_ids),
+                    post_id=rnd.choice(post_ids),
+                    created=random_date(),
+                )
+                for _ in batch
+            )
+    log(f'Комментариев: {comments}')
+
+    pairs = set()
+    while len(pairs) < min(follows, len(user_ids) * (len(user_ids) - 1)):
+        user_id, author_id = rnd.sample(user_ids, 2)
+        pairs.add((user_id, author_id))
+    for batch in batched(pairs, batch_size):
+        Follow.objects.bulk_create(
+            (
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in batch
+            ),
+            ignore_conflicts=True,
+        )
+    log(f'Подписок: {len(pairs)}')
+
+    follow_graph.reset()
+    if rebuild:
+        call_command('rebuild_author_stats', stdout=StringIO())
+        call_command('rebuild_feeds', stdout=StringIO())
+        if search.available():
+            search.rebuild()
+        trending.rebuild()
+    return {'users': user_ids, 'groups': group_ids, 'posts': post_ids}
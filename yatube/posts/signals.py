@@ -0,0 +1,141 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import caching, feed, follow_graph, search, thumbnails, trending
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created and instance.author_id:
+        AuthorStats.objects.bump(instance.author_id, 'posts_count', 1)
+        if settings.POSTS_FEED_FANOUT:
+            feed.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    if instance.author_id:
+        AuthorStats.objects.bump(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.bump(instance.author_id, 'comments_count', 1)
+        trending.bump(instance.post_id, trending.COMMENT_WEIGHT)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    AuthorStats.objects.bump(instance.author_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.bump(instance.author_id, 'followers_count', 1)
+        AuthorStats.objects.bump(instance.user_id, 'following_count', 1)
+        feed.followers_changed(instance.author_id, 1)
+        follow_graph.update(instance.user_id, instance.author_id)
+        if settings.POSTS_FEED_FANOUT:
+            feed.backfill(instance.user_id, instance.author_id)
+
+
+def follows_created(user_id, author_ids):
+    """То же, что follow_created, для подписок из bulk_create."""
+    AuthorStats.objects.bump(user_id, 'following_count', len(author_ids))
+    for author_id in author_ids:
+        AuthorStats.objects.bump(author_id, 'followers_count', 1)
+        feed.followers_changed(author_id, 1)
+        follow_graph.update(user_id, author_id)
+        if settings.POSTS_FEED_FANOUT:
+            feed.backfill(user_id, author_id)
+    caching.bump_version('follows', user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    AuthorStats.objects.bump(instance.author_id, 'followers_count', -1)
+    AuthorStats.objects.bump(instance.user_id, 'following_count', -1)
+    feed.followers_changed(instance.author_id, -1)
+    follow_graph.update(instance.user_id, instance.author_id)
+    if settings.POSTS_FEED_FANOUT:
+        feed.prune(instance.user_id, instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def post_moving(sender, instance, **kwargs):
+    # Пост, ушедший из группы, меняет и её страницу.
+    instance.previous_group_id = Post.objects.filter(
+        pk=instance.pk
+    ).values_list('group_id', flat=True).first() if instance.pk else None
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    caching.bump_version('post', instance.pk)
+    caching.bump_version('feed', 'index')
+    caching.bump_post_lists(
+        [instance.author_id],
+        [instance.group_id, getattr(instance, 'previous_group_id', None)],
+    )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    caching.bump_version('group', instance.pk)
+    caching.bump_version('feed', 'index')
+    # Слаг группы есть в постах профилей в API.
+    caching.bump_post_lists(author_ids=Post.objects.filter(
+        group_id=instance.pk
+    ).order_by().values_list('author_id', flat=True).distinct())
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created=False, update_fields=None,
+                 **kwargs):
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    caching.bump_version('user', instance.pk)
+    caching.bump_version('feed', 'index')
+    if not created:
+        # Имя автора есть в карточках его постов на страницах групп.
+        caching.bump_post_lists(group_ids=Post.objects.filter(
+            author_id=instance.pk
+        ).order_by().values_list('group_id', flat=True).distinct())
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    caching.bump_version('follows', instance.user_id)
+
+
+@receiver(post_save, sender=Post)
+def post_trending(sender, instance, created, **kwargs):
+    if created:
+        trending.add_post(instance)
+    else:
+        trending.move_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_thumbnails(sender, instance, **kwargs):
+    if instance.image and not thumbnails.ready(instance.image):
+        thumbnails.schedule(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def post_indexed(sender, instance, **kwargs):
+    if search.available():
+        search.index_post(instance.pk, instance.text)
+
+
+@receiver(post_delete, sender=Post)
+def post_unindexed(sender, instance, **kwargs):
+    if search.available():
+        search.remove_post(instance.pk)
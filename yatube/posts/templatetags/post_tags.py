@@ -0,0 +1,20 @@
+from django import template
+
+from posts import caching, thumbnails
+
+register = template.Library()
+
+
+@register.filter
+def card_version(post):
+    return caching.card_version(post)
+
+
+@register.simple_tag
+def thumbnail_or_none(post, size):
+    """Готовая миниатюра картинки поста; если её нет, ставит генерацию
+    в фоновый пул и возвращает None, чтобы шаблон показал заглушку."""
+    thumbnail = thumbnails.cached_thumbnail(post.image, size)
+    if thumbnail is None and post.image:
+        thumbnails.schedule(post.pk, inline=False)
+    return thumbnail
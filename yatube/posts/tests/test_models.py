@@ -1,6 +1,15 @@
-from django.test import TestCase
+import os
+import tempfile
+from io import StringIO
 
-from posts.models import Group, Post, User
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+
+from posts import comment_queue, trending
+from posts.models import (
+    AuthorStats, Comment, Follow, Group, Post, TrendingScore, User
+)
 
 
 class PostModelTest(TestCase):
@@ -39,3 +48,119 @@ class GroupModelTest(TestCase):
         group = GroupModelTest.group
         expected_object_name = group.title
         self.assertEqual(expected_object_name, str(group))
+
+
+class AuthorStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def assertCounts(self, user, **expected):
+        stats = AuthorStats.objects.get(user=user)
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(stats, field), value)
+
+    def test_counters_follow_signals(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        Post.objects.create(author=self.author, text='Второй пост')
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertCounts(self.author, posts_count=2, followers_count=1)
+        self.assertCounts(
+            self.reader, comments_count=1, following_count=1)
+        post.delete()
+        Follow.objects.all().delete()
+        self.assertCounts(self.author, posts_count=1, followers_count=0)
+        self.assertCounts(
+            self.reader, comments_count=0, following_count=0)
+
+    def test_follow_is_unique(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_rebuild_command(self):
+        Post.objects.create(author=self.author, text='Пост')
+        Follow.objects.create(user=self.reader, author=self.author)
+        AuthorStats.objects.update(posts_count=100, following_count=7)
+        call_command('rebuild_author_stats', stdout=StringIO())
+        self.assertCounts(self.author, posts_count=1, followers_count=1)
+        self.assertCounts(self.reader, posts_count=0, following_count=1)
+
+
+@override_settings(
+    POSTS_TRENDING_HALF_LIFE=3600, POSTS_TRENDING_MIN_SCORE=0.6
+)
+class TrendingScoreTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+
+    def score(self, post):
+        return TrendingScore.objects.get(post=post).score
+
+    def test_events_decay_and_compaction(self):
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост')
+        quiet = Post.objects.create(author=self.author, text='Тихий пост')
+        Comment.objects.create(post=post, author=self.author, text='Ок')
+        comment_queue.flush([
+            Comment(post=post, author=self.author, text='Пачка')
+            for _ in range(2)
+        ])
+        expected = trending.POST_WEIGHT + 3 * trending.COMMENT_WEIGHT
+        self.assertEqual(self.score(post), expected)
+        self.assertEqual(
+            TrendingScore.objects.get(post=post).group, self.group)
+        call_command('decay_trending', elapsed=3600, stdout=StringIO())
+        self.assertAlmostEqual(self.score(post), expected / 2)
+        self.assertFalse(TrendingScore.objects.filter(post=quiet).exists())
+        call_command('decay_trending', rebuild=True, stdout=StringIO())
+        self.assertAlmostEqual(self.score(post), expected, places=2)
+        self.assertEqual(
+            [row['group__slug'] for row in trending.top_groups(5)],
+            ['group'],
+        )
+
+
+class TransferCommandsTest(TestCase):
+    def test_export_import_round_trip(self):
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        post = Post.objects.create(author=author, group=group, text='Пост')
+        Comment.objects.create(post=post, author=reader, text='Ок')
+        Follow.objects.create(user=reader, author=author)
+        kinds = (('posts', 'ndjson'), ('comments', 'csv'), ('follows', 'csv'))
+        pub_date = post.pub_date
+        with tempfile.TemporaryDirectory() as folder:
+            for kind, file_format in kinds:
+                call_command(
+                    'export_posts', os.path.join(folder, kind), kind=kind,
+                    format=file_format, stderr=StringIO(),
+                )
+            Post.objects.all().delete()
+            User.objects.all().delete()
+            Group.objects.all().delete()
+            for kind, file_format in kinds:
+                call_command(
+                    'import_posts', os.path.join(folder, kind), kind=kind,
+                    format=file_format, batch_size=1,
+                    stdout=StringIO(), stderr=StringIO(),
+                )
+        imported = Post.objects.get(id=post.id)
+        self.assertEqual(imported.author.username, 'author')
+        self.assertEqual(imported.group.slug, 'group')
+        self.assertEqual(imported.pub_date, pub_date)
+        self.assertEqual(imported.comments.get().author.username, 'reader')
+        self.assertTrue(Follow.objects.filter(
+            user__username='reader', author__username='author').exists())
+        self.assertEqual(
+            AuthorStats.objects.get(user=imported.author).followers_count, 1)
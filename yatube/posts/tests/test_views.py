@@ -1,16 +1,30 @@
 import shutil
 import tempfile
+import threading
+import time
 
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
-from django.test import Client, TestCase, override_settings
+from django.core.management import call_command
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
 from django.urls import reverse
 
-from posts.models import Comment, Follow, Group, Post, User
+from core.middleware import PrimaryPinningMiddleware
+from core.routers import ReplicaRouter
+from posts import (
+    caching, comment_queue, follow_graph, suggestions, thumbnails
+)
+from posts.models import (
+    AuthorStats, Comment, FeedEntry, Follow, Group, Post, User
+)
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -68,6 +82,7 @@ class PostViewTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -101,6 +116,128 @@ class PostViewTests(TestCase):
                 response = self.authorized_client.get(page)
                 self.assertEqual(len(response.context['page_obj']), amount)
 
+    def test_pages_cursor_paginator_posts(self):
+        for post in range(12):
+            Post.objects.create(
+                author=self.user,
+                text='посты для курсора',
+                group=self.group,
+            )
+        address = reverse(GROUP, kwargs={'slug': self.group.slug})
+        first_page = self.authorized_client.get(
+            address + '?cursor=').context['page_obj']
+        self.assertEqual(len(first_page), 10)
+        self.assertFalse(first_page.has_previous())
+        second_page = self.authorized_client.get(
+            address + '?cursor=' + first_page.next_cursor
+        ).context['page_obj']
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(second_page.has_next())
+        self.assertEqual(second_page[2], self.post)
+        back_page = self.authorized_client.get(
+            address + '?cursor=' + second_page.previous_cursor
+        ).context['page_obj']
+        self.assertEqual(list(back_page), list(first_page))
+        broken_page = self.authorized_client.get(
+            address + '?cursor=broken').context['page_obj']
+        self.assertEqual(list(broken_page), list(first_page))
+
+    def test_paginator_window_is_bounded(self):
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {number}')
+            for number in range(300)
+        )
+        response = self.guest_client.get(
+            reverse(PROFILE, args=[self.author.username]), {'page': 15})
+        self.assertEqual(
+            response.context['page_obj'].page_window,
+            [1, None, 13, 14, 15, 16, 17, None, 31],
+        )
+        self.assertContains(response, 'page=31"')
+        self.assertNotContains(response, 'page=20"')
+
+    def test_feed_query_budget(self):
+        """Число запросов на страницу ленты не зависит от числа постов"""
+        for number in range(12):
+            Post.objects.create(
+                author=User.objects.create_user(username=f'writer{number}'),
+                text='пост для бюджета запросов',
+                group=Group.objects.create(
+                    title=f'Группа {number}',
+                    slug=f'budget-{number}',
+                    description='Группа для бюджета запросов',
+                ),
+            )
+            Follow.objects.create(
+                user=self.follower, author=User.objects.get(
+                    username=f'writer{number}')
+            )
+        pages_budget = {
+            reverse(INDEX): 2,
+            # id группы для ETag выбирается отдельным запросом.
+            reverse(GROUP, kwargs={'slug': 'budget-0'}): 4,
+            reverse(PROFILE, kwargs={'username': 'writer0'}): 5,
+        }
+        for page, budget in pages_budget.items():
+            with self.subTest(page=page):
+                cache.clear()
+                with self.assertNumQueries(budget):
+                    self.guest_client.get(page)
+        self.authorized_follower.get(reverse(FOLLOW))
+        # Ключи страницы по индексу FeedEntry, затем посты по id.
+        with self.assertNumQueries(7):
+            self.authorized_follower.get(reverse(FOLLOW))
+
+    def test_post_card_cache(self):
+        """Карточка поста берётся из кэша до изменения поста или автора"""
+        address = reverse(GROUP, kwargs={'slug': self.group.slug})
+        self.guest_client.get(address)
+        Post.objects.filter(id=self.post.id).update(text='Тихая правка')
+        response = self.guest_client.get(address)
+        self.assertContains(response, 'Тестовый пост')
+        post = Post.objects.get(id=self.post.id)
+        post.save()
+        response = self.guest_client.get(address)
+        self.assertContains(response, 'Тихая правка')
+        self.author.first_name = 'Новое'
+        self.author.last_name = 'Имя'
+        self.author.save()
+        response = self.guest_client.get(address)
+        self.assertContains(response, 'Новое Имя')
+
+    def test_thumbnail_placeholder_until_generated(self):
+        address = reverse(DETAIL, kwargs={'post_id': self.post.id})
+        response = self.guest_client.get(address)
+        self.assertIsNone(thumbnails.cached_thumbnail(self.post.image, 'card'))
+        self.assertContains(response, 'bg-light')
+        thumbnails.generate(self.post.id)
+        thumbnail = thumbnails.cached_thumbnail(self.post.image, 'card')
+        self.assertIsNotNone(thumbnail)
+        response = self.guest_client.get(address)
+        self.assertContains(response, thumbnail.url)
+
+    def test_generate_thumbnails_all_regenerates(self):
+        thumbnails.generate(self.post.id)
+        thumbnail = thumbnails.cached_thumbnail(self.post.image, 'card')
+        thumbnail.delete()
+        call_command('generate_thumbnails', stdout=StringIO())
+        self.assertFalse(thumbnail.exists())
+        call_command('generate_thumbnails', all=True, stdout=StringIO())
+        self.assertTrue(thumbnail.exists())
+
+    @override_settings(POSTS_THUMBNAIL_ASYNC=False)
+    def test_thumbnails_are_queued_on_save_not_on_render(self):
+        address = reverse(DETAIL, kwargs={'post_id': self.post.id})
+        with mock.patch.object(thumbnails, 'generate') as generate, \
+                mock.patch.object(thumbnails, '_submit') as submit:
+            response = self.guest_client.get(address)
+        self.assertContains(response, 'bg-light')
+        generate.assert_not_called()
+        submit.assert_not_called()
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            self.post.save()
+        schedule.assert_called_once_with(self.post.pk)
+
     def test_pages_uses_correct_template(self):
         cache.clear()
         templates_pages_names = {
@@ -233,11 +370,277 @@ class PostViewTests(TestCase):
         self.assertTrue(Comment.objects.filter(
             text='Тестовый комментарий к посту').exists())
 
+    def test_ajax_comment_returns_fragment(self):
+        response = self.authorized_client.post(
+            reverse(COMMENT, kwargs={'post_id': self.post.id}),
+            {'text': 'Комментарий без перезагрузки'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertIn('Комментарий без перезагрузки', response.json()['html'])
+        self.assertIn(self.user.username, response.json()['html'])
+        response = self.authorized_client.post(
+            reverse(COMMENT, kwargs={'post_id': self.post.id}),
+            {'text': ''},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('text', response.json()['errors'])
+
+    @override_settings(
+        POSTS_COMMENT_WRITE_BEHIND=True, POSTS_COMMENT_COMMIT_TIMEOUT=0.01
+    )
+    def test_comment_commit_timeout_is_not_an_error(self):
+        self.addCleanup(comment_queue.drain)
+        with self.assertLogs('posts.comment_queue', 'WARNING') as logs:
+            self.assert_comment_pending('Медленный')
+        self.assertEqual(len(logs.output), 2)
+
+    @override_settings(
+        POSTS_COMMENT_WRITE_BEHIND=True, POSTS_COMMENT_DURABILITY='queued'
+    )
+    def test_queued_comment_is_pending(self):
+        self.addCleanup(comment_queue.drain)
+        self.assert_comment_pending('В очереди')
+
+    def assert_comment_pending(self, text):
+        address = reverse(COMMENT, kwargs={'post_id': self.post.id})
+        with mock.patch.object(comment_queue, '_start_worker'):
+            response = self.authorized_client.post(
+                address, {'text': text}, follow=True)
+            self.assertContains(response, 'Комментарий сохраняется')
+            response = self.authorized_client.post(
+                address, {'text': text},
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            )
+            self.assertEqual(response.status_code, HTTPStatus.ACCEPTED)
+            self.assertTrue(response.json()['pending'])
+        comment_queue.drain()
+        self.assertEqual(Comment.objects.filter(text=text).count(), 2)
+
+    def test_comment_queue_flush_updates_stats(self):
+        comment_queue.flush([
+            Comment(post=self.post, author=self.user, text=f'Пачка {number}')
+            for number in range(3)
+        ])
+        self.assertEqual(
+            Comment.objects.filter(text__startswith='Пачка').count(), 3)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.user).comments_count, 3)
+
+    def test_comments_are_paginated(self):
+        for number in range(25):
+            Comment.objects.create(
+                post=self.post, author=self.user, text=f'Комментарий {number}'
+            )
+        response = self.guest_client.get(
+            reverse(DETAIL, kwargs={'post_id': self.post.id}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 20)
+        self.assertEqual(comments[0].text, 'Комментарий 24')
+        self.assertTrue(comments.has_next())
+        more_url = reverse('posts:post_comments', kwargs={
+            'post_id': self.post.id}) + '?cursor=' + comments.next_cursor
+        with self.assertNumQueries(2):
+            response = self.guest_client.get(more_url)
+        self.assertEqual(len(response.context['comments']), 5)
+        self.assertContains(response, 'Комментарий 0')
+        self.assertNotContains(response, 'Показать ещё')
+        data = self.guest_client.get(more_url + '&format=json').json()
+        self.assertEqual(len(data['comments']), 5)
+        self.assertEqual(data['comments'][0]['author'], self.user.username)
+        self.assertIsNone(data['next_cursor'])
+
+    def test_trending_pages(self):
+        quiet = Post.objects.create(
+            author=self.author, group=self.group, text='Тихий пост')
+        Comment.objects.create(post=self.post, author=self.user, text='Ок')
+        group_url = reverse('posts:group_trending', args=[self.group.slug])
+        self.assertEqual(
+            list(self.guest_client.get(group_url).context['posts']),
+            [self.post, quiet],
+        )
+        # Группа и топ её постов: второй запрос идёт по индексу
+        # (group, -score) без подсчётов по комментариям.
+        with self.assertNumQueries(2):
+            self.guest_client.get(group_url)
+        response = self.guest_client.get(reverse('posts:trending'))
+        self.assertEqual(response.context['posts'][0], self.post)
+        self.assertEqual(
+            response.context['groups'][0]['group__slug'], self.group.slug)
+
+    def test_search(self):
+        Post.objects.create(author=self.user, text='Про котов и собак')
+        dogs = Post.objects.create(author=self.user, text='Собаки, собаки')
+        Post.objects.create(author=self.user, text='Про птиц')
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'собак'})
+        found = list(response.context['page_obj'])
+        self.assertEqual(len(found), 2)
+        self.assertEqual(found[0], dogs)
+        dogs.text = 'Теперь про рыб'
+        dogs.save()
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'собак'})
+        self.assertEqual(len(response.context['page_obj']), 1)
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': '"AND (*'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_search_always_uses_numbered_pages(self):
+        dogs = Post.objects.create(author=self.user, text='Собаки, собаки')
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'собак', 'cursor': ''})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(list(response.context['page_obj']), [dogs])
+        with self.settings(POSTS_CURSOR_PAGINATION=True):
+            response = self.guest_client.get(
+                reverse('posts:search'), {'q': 'собак'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(list(response.context['page_obj']), [dogs])
+
+    def test_api_feeds_conditional_get(self):
+        urls = (
+            reverse('api:index'),
+            reverse('api:group_list', args=[self.group.slug]),
+            reverse('api:profile', args=[self.author.username]),
+            reverse('api:post_detail', args=[self.post.id]),
+            reverse('api:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(
+                    self.authorized_client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    ).status_code,
+                    HTTPStatus.NOT_MODIFIED,
+                )
+        response = self.guest_client.get(reverse('api:index'))
+        post = response.json()['results'][0]
+        self.assertEqual(post['author'], self.author.username)
+        self.assertEqual(post['group'], self.group.slug)
+        etag = response['ETag']
+        # Дата свежего поста не меняется при правке: Last-Modified
+        # не отдаётся, валидатор только ETag из счётчиков версий.
+        self.assertNotIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(
+                reverse('api:index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.filter(id=self.post.id).get().save()
+        response = self.guest_client.get(
+            reverse('api:index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        response = self.guest_client.get(
+            reverse('api:index'),
+            HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_html_pages_not_modified(self):
+        pages = {
+            reverse(GROUP, args=[self.group.slug]): 'includes/post.html',
+            reverse(PROFILE, args=[self.author.username]):
+                'includes/post.html',
+            reverse(DETAIL, args=[self.post.id]): 'posts/post_detail.html',
+        }
+        for page, template in pages.items():
+            with self.subTest(page=page):
+                # Первый ответ выдаёт CSRF-cookie, она входит в ETag.
+                self.authorized_client.get(page)
+                response = self.authorized_client.get(page)
+                self.assertTemplateUsed(response, template)
+                response = self.authorized_client.get(
+                    page, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED)
+                # 304 отдаётся до рендеринга: ни одного шаблона.
+                self.assertEqual(response.templates, [])
+                self.assertTemplateNotUsed(response, template)
+        profile = reverse(PROFILE, args=[self.author.username])
+        etag = self.authorized_client.get(profile)['ETag']
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.authorized_client.get(
+            profile, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        detail = reverse(DETAIL, args=[self.post.id])
+        etag = self.authorized_client.get(detail)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Новый комментарий')
+        response = self.authorized_client.get(
+            detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Новый комментарий')
+
+    def test_group_and_profile_etags_follow_their_own_posts(self):
+        other_group = Group.objects.create(title='Другая', slug='other')
+        group = reverse(GROUP, args=[self.group.slug])
+        profile = reverse(PROFILE, args=[self.author.username])
+        api_group = reverse('api:group_list', args=[self.group.slug])
+
+        def etags():
+            return [
+                self.guest_client.get(page)['ETag']
+                for page in (group, profile, api_group)
+            ]
+
+        before = etags()
+        Post.objects.create(author=self.user, group=other_group, text='Чужой')
+        self.assertEqual(etags(), before)
+        post = Post.objects.create(
+            author=self.user, group=self.group, text='Свой')
+        after = etags()
+        self.assertNotEqual(after[0], before[0])
+        self.assertEqual(after[1], before[1])
+        self.assertNotEqual(after[2], before[2])
+        post.group = other_group
+        post.save()
+        self.assertNotEqual(etags()[0], after[0])
+        before = etags()
+        Post.objects.create(author=self.author, text='Автора')
+        after = etags()
+        self.assertEqual(after[0], before[0])
+        self.assertNotEqual(after[1], before[1])
+        # Имя автора есть в карточках его постов на странице группы.
+        self.author.first_name = 'Переименованный'
+        self.author.save()
+        self.assertNotEqual(etags()[0], after[0])
+
     def test_cache(self):
         first_response = self.authorized_client.get(reverse(INDEX))
-        Post.objects.get(id=self.post.id).delete()
+        Post.objects.filter(id=self.post.id).update(text='Тихая правка')
         second_response = self.authorized_client.get(reverse(INDEX))
         self.assertEqual(first_response.content, second_response.content)
+        Post.objects.get(id=self.post.id).delete()
+        third_response = self.authorized_client.get(reverse(INDEX))
+        self.assertNotContains(third_response, 'Тихая правка')
+        self.assertNotContains(third_response, 'Тестовый пост')
+
+    def test_cache_serves_stale_page_during_refresh(self):
+        cache.clear()
+        self.guest_client.get(reverse(INDEX))
+        Post.objects.create(author=self.author, text='Свежий пост')
+        lock = caching.lock_key(caching.feed_key(
+            'index', self.guest_client.get(reverse(INDEX)).wsgi_request))
+        Post.objects.create(author=self.author, text='Ещё свежее')
+        cache.add(lock, True)
+        response = self.guest_client.get(reverse(INDEX))
+        self.assertEqual(response['X-Feed-Cache'], 'stale')
+        self.assertNotContains(response, 'Ещё свежее')
+        cache.delete(lock)
+        response = self.guest_client.get(reverse(INDEX))
+        self.assertContains(response, 'Ещё свежее')
+
+    def test_cold_cache_renders_without_waiting_for_lock(self):
+        cache.clear()
+        response = self.guest_client.get(reverse(INDEX))
+        cache.clear()
+        cache.add(caching.lock_key(caching.feed_key(
+            'index', response.wsgi_request)), True)
+        response = self.guest_client.get(reverse(INDEX))
+        self.assertEqual(response['X-Feed-Cache'], 'miss')
+        self.assertContains(response, self.post.text)
 
     def test_new_post(self):
         # новая запись пользователя появляется в ленте тех,
@@ -280,6 +683,55 @@ class PostViewTests(TestCase):
             response.context['page_obj'][1].text, form_data_2['text']
         )
 
+    def test_follow_feed_fan_out(self):
+        """Лента подписок собирается из FeedEntry и чистится при отписке"""
+        follow = Follow.objects.create(user=self.follower, author=self.author)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.follower, post=self.post).exists())
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        response = self.authorized_follower.get(reverse(FOLLOW))
+        self.assertEqual(
+            list(response.context['page_obj']), [new_post, self.post]
+        )
+        follow.delete()
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.follower).exists())
+
+    @override_settings(POSTS_FEED_FANOUT_MAX_FOLLOWERS=0)
+    def test_follow_feed_celebrity_fan_out_on_read(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        Post.objects.create(author=self.author, text='Пост звезды')
+        self.assertFalse(FeedEntry.objects.filter(
+            post__text='Пост звезды').exists())
+        response = self.authorized_follower.get(reverse(FOLLOW))
+        self.assertEqual(
+            response.context['page_obj'][0].text, 'Пост звезды'
+        )
+
+    @override_settings(POSTS_FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_follow_feed_author_crosses_celebrity_threshold(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertFalse(
+            FeedEntry.objects.filter(post__author=self.author).exists())
+        star_post = Post.objects.create(author=self.author, text='Звезда')
+        response = self.authorized_follower.get(reverse(FOLLOW))
+        self.assertEqual(
+            list(response.context['page_obj']), [star_post, self.post])
+        response = self.authorized_follower.get(reverse(FOLLOW), {
+            'cursor': ''})
+        self.assertEqual(list(response.context['page_obj']), [
+            star_post, self.post])
+        Follow.objects.filter(user=self.user).delete()
+        self.assertEqual(
+            set(FeedEntry.objects.filter(user=self.follower).values_list(
+                'post_id', flat=True)),
+            {star_post.id, self.post.id},
+        )
+        response = self.authorized_follower.get(reverse(FOLLOW))
+        self.assertEqual(
+            list(response.context['page_obj']), [star_post, self.post])
+
     def test_profile_follow(self):
         response = self.guest_client.get(reverse(FOLLOW))
         self.assertRedirects(response, '/auth/login/?next=/follow/')
@@ -297,6 +749,83 @@ class PostViewTests(TestCase):
                 user=self.follower, author=self.author).exists()
         )
 
+    def test_follow_graph_drives_profile(self):
+        profile = reverse(PROFILE, args=[self.author.username])
+        response = self.authorized_follower.get(profile)
+        self.assertFalse(response.context['following'])
+        response = self.authorized_follower.get(
+            reverse('posts:profile_follow', args=[self.author.username]))
+        self.assertRedirects(response, profile)
+        self.assertTrue(self.authorized_follower.get(
+            profile).context['following'])
+        Follow.objects.create(user=self.author, author=self.follower)
+        self.assertEqual(
+            follow_graph.mutual_ids(self.follower.pk), {self.author.pk})
+        self.assertTrue(self.authorized_follower.get(
+            profile).context['follows_you'])
+        self.assertFalse(self.authorized_author.get(
+            profile).context['can_follow'])
+        self.authorized_follower.get(
+            reverse('posts:profile_unfollow', args=[self.author.username]))
+        self.assertEqual(follow_graph.followee_ids(self.follower.pk), set())
+        # Сигнал сбрасывает множество, а не правит закэшированную копию:
+        # ребро, записанное без сигнала, тоже видно после перезагрузки.
+        Follow.objects.bulk_create(
+            [Follow(user=self.follower, author=self.user)])
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertEqual(
+            follow_graph.followee_ids(self.follower.pk),
+            {self.user.pk, self.author.pk},
+        )
+
+    def test_follow_batch(self):
+        url = reverse('posts:follow_batch')
+        usernames = [self.author.username, self.user.username, 'nobody']
+        self.authorized_follower.post(url, {'usernames': usernames})
+        self.assertEqual(
+            follow_graph.followee_ids(self.follower.pk),
+            {self.author.pk, self.user.pk},
+        )
+        stats = AuthorStats.objects.get(user=self.follower)
+        self.assertEqual(stats.following_count, 2)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.follower, post=self.post).exists())
+        response = self.authorized_follower.post(
+            url, {'usernames': usernames, 'action': 'unfollow'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(response.json(), {'changed': 2})
+        self.assertFalse(Follow.objects.filter(user=self.follower).exists())
+
+    def test_follow_suggestions(self):
+        Follow.objects.create(user=self.follower, author=self.user)
+        Follow.objects.create(user=self.user, author=self.author)
+        suggestions.rebuild()
+        response = self.authorized_follower.get(reverse(FOLLOW))
+        self.assertEqual(
+            [item.suggested for item in response.context['suggestions']],
+            [self.author],
+        )
+        self.authorized_follower.post(
+            reverse('posts:follow_batch'),
+            {'usernames': [self.author.username]},
+        )
+        response = self.authorized_follower.get(reverse(FOLLOW))
+        self.assertEqual(response.context['suggestions'], [])
+
+    def test_own_profile_etag_follows_csrf_cookie(self):
+        Follow.objects.create(user=self.follower, author=self.user)
+        Follow.objects.create(user=self.user, author=self.author)
+        suggestions.rebuild()
+        profile = reverse(PROFILE, args=[self.follower.username])
+        self.authorized_follower.get(profile)
+        etag = self.authorized_follower.get(profile)['ETag']
+        self.authorized_follower.cookies[settings.CSRF_COOKIE_NAME] = 'x' * 64
+        response = self.authorized_follower.get(
+            profile, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'follow/batch/')
+
     def test_profile_unfollow(self):
         Follow.objects.create(user=self.follower, author=self.author)
         self.assertTrue(
@@ -315,3 +844,37 @@ class PostViewTests(TestCase):
                 user=self.follower,
                 author=self.author).exists()
         )
+
+
+@override_settings(POSTS_PARALLEL_FETCH=True, DATABASE_REPLICAS=['replica0'])
+class ParallelFetchTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        Post.objects.create(author=self.author, text='Параллельный пост')
+
+    def test_profile_pool_threads_keep_router_state(self):
+        seen = []
+        route = ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            # Реплики в тестах нет: запоминаем выбор, читаем из default.
+            database = route(router, model, **hints)
+            seen.append((threading.current_thread().name, database))
+            return 'default'
+
+        def pool_databases():
+            return {db for name, db in seen if name.startswith('fetch')}
+
+        address = reverse(PROFILE, kwargs={'username': 'author'})
+        client = Client()
+        with mock.patch.object(ReplicaRouter, 'db_for_read', spy):
+            response = client.get(address)
+            self.assertContains(response, 'Параллельный пост')
+            self.assertEqual(pool_databases(), {'replica0'})
+            seen.clear()
+            client.cookies[PrimaryPinningMiddleware.cookie_name] = str(
+                time.time() + 60)
+            response = client.get(address)
+            self.assertContains(response, 'Параллельный пост')
+            self.assertEqual(pool_databases(), {'default'})
@@ -0,0 +1,129 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+Шаблоны не генерируют миниатюры сами: тег thumbnail_or_none отдаёт
+готовую миниатюру из kvstore sorl-thumbnail или None, и тогда шаблон
+рисует заглушку. Генерацию ставит сигнал сохранения поста (в пуле
+потоков или синхронно после коммита), а команда generate_thumbnails
+догоняет всё пропущенное. Запрос, который рисует страницу, миниатюры
+не готовит никогда.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as thumbnail_defaults
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from core.routers import primary
+
+from . import caching
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Все размеры, которые используют шаблоны.
+THUMBNAIL_SIZES = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.POSTS_THUMBNAIL_WORKERS,
+    thread_name_prefix='thumbnails',
+)
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+class PregeneratedThumbnailBackend(ThumbnailBackend):
+    def get_cached_thumbnail(self, file_, geometry_string, **options):
+        """Миниатюра из kvstore или None; сама ничего не генерирует.
+
+        Опции и имя файла готовятся так же, как в начале
+        ThumbnailBackend.get_thumbnail из sorl-thumbnail 12.7
+        (requirements.txt); при обновлении sorl сверить с ним.
+        """
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(thumbnail_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = PregeneratedThumbnailBackend()
+
+
+def cached_thumbnail(image, size):
+    if not image:
+        return None
+    geometry, options = THUMBNAIL_SIZES[size]
+    return backend.get_cached_thumbnail(image, geometry, **options)
+
+
+def ready(image):
+    return all(cached_thumbnail(image, size) for size in THUMBNAIL_SIZES)
+
+
+def generate(post_id, force=False):
+    """Готовит все размеры миниатюр поста и сбрасывает его карточку.
+
+    get_thumbnail отдаёт найденную в kvstore миниатюру как есть, поэтому
+    при force старые миниатюры сначала удаляются вместе с файлами.
+    """
+    image, author_id, group_id = Post.objects.filter(
+        id=post_id
+    ).values_list('image', 'author_id', 'group_id').first() or (
+        None, None, None)
+    if not image:
+        return
+    source = ImageFile(image, default.storage)
+    if force:
+        default.kvstore.delete_thumbnails(source)
+    for geometry, options in THUMBNAIL_SIZES.values():
+        backend.get_thumbnail(source, geometry, **options)
+    if ready(image):
+        caching.bump_version('post', post_id)
+        caching.bump_version('feed', 'index')
+        caching.bump_post_lists([author_id], [group_id])
+
+
+def _run(post_id):
+    try:
+        with primary():
+            generate(post_id)
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюры поста %s', post_id)
+    finally:
+        with _pending_lock:
+            _pending.discard(post_id)
+        close_old_connections()
+
+
+def _submit(post_id):
+    with _pending_lock:
+        if post_id in _pending:
+            return
+        _pending.add(post_id)
+    _executor.submit(_run, post_id)
+
+
+def schedule(post_id, inline=True):
+    """Ставит генерацию миниатюр в очередь после коммита транзакции.
+
+    Без пула миниатюры готовятся синхронно после коммита, а с
+    inline=False (из шаблона) не готовятся вовсе.
+    """
+    if settings.POSTS_THUMBNAIL_ASYNC:
+        transaction.on_commit(lambda: _submit(post_id))
+    elif inline:
+        transaction.on_commit(lambda: generate(post_id))
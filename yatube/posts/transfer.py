@@ -0,0 +1,158 @@
+"""Потоковый экспорт и импорт постов, комментариев и подписок.
+
+Записи читаются из базы через iterator() порциями и пишутся построчно
+(NDJSON или CSV); импорт собирает пачки и вставляет их bulk_create
+в отдельных транзакциях. Пользователи и группы ссылаются по username и
+slug и сопоставляются с id через словари в памяти.
+"""
+import csv
+import json
+import time
+
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Follow, Group, Post, User
+
+KINDS = {
+    'posts': {
+        'model': Post,
+        'fields': ('id', 'text', 'pub_date', 'author', 'group', 'image'),
+        'lookups': (
+            'id', 'text', 'pub_date', 'author__username', 'group__slug',
+            'image',
+        ),
+        'dates': ('pub_date',),
+    },
+    'comments': {
+        'model': Comment,
+        'fields': ('id', 'post', 'author', 'text', 'created'),
+        'lookups': ('id', 'post_id', 'author__username', 'text', 'created'),
+        'dates': ('created',),
+    },
+    'follows': {
+        'model': Follow,
+        'fields': ('user', 'author'),
+        'lookups': ('user__username', 'author__username'),
+        'dates': (),
+    },
+}
+
+
+def export_rows(kind, chunk_size):
+    spec = KINDS[kind]
+    rows = spec['model'].objects.order_by().values_list(*spec['lookups'])
+    for row in rows.iterator(chunk_size=chunk_size):
+        record = dict(zip(spec['fields'], row))
+        for field in spec['dates']:
+            record[field] = record[field].isoformat()
+        yield record
+
+
+def write_records(records, stream, file_format, fields):
+    if file_format == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=fields)
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            yield record
+        return
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        yield record
+
+
+def read_records(stream, file_format):
+    if file_format == 'csv':
+        for record in csv.DictReader(stream):
+            yield {key: value or None for key, value in record.items()}
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def with_progress(records, log, every):
+    """Пропускает записи насквозь и раз в every строк пишет скорость."""
+    started = time.perf_counter()
+    count = 0
+    for count, record in enumerate(records, 1):
+        yield record
+        if count % every == 0:
+            elapsed = time.perf_counter() - started
+            log(f'{count} строк, {count / elapsed:.0f} строк/с')
+    elapsed = time.perf_counter() - started
+    log(f'Итого {count} строк за {elapsed:.1f} с')
+
+
+class IdMap:
+    """username/slug -> id; недостающие строки создаются пачкой."""
+
+    def __init__(self, model, field, defaults):
+        self.model = model
+        self.field = field
+        self.defaults = defaults
+        self.ids = dict(model.objects.values_list(field, 'id'))
+
+    def resolve(self, values):
+        missing = {value for value in values if value} - self.ids.keys()
+        if missing:
+            self.model.objects.bulk_create(
+                [
+                    self.model(**{self.field: value}, **self.defaults(value))
+                    for value in missing
+                ],
+                ignore_conflicts=True,
+            )
+            self.ids.update(self.model.objects.filter(
+                **{f'{self.field}__in': missing}
+            ).values_list(self.field, 'id'))
+
+    def __getitem__(self, value):
+        return self.ids[value] if value else None
+
+
+def user_map():
+    return IdMap(User, 'username', lambda username: {'password': '!'})
+
+
+def group_map():
+    return IdMap(Group, 'slug', lambda slug: {
+        'title': slug, 'description': ''
+    })
+
+
+def build_objects(kind, records, users, groups):
+    """Модели для пачки записей; ссылки разрешаются через словари id."""
+    users.resolve(
+        value for record in records
+        for value in (record.get('author'), record.get('user'))
+    )
+    if kind == 'posts':
+        groups.resolve(record.get('group') for record in records)
+        return [
+            Post(
+                id=record.get('id'),
+                text=record['text'],
+                pub_date=parse_datetime(record['pub_date']),
+                author_id=users[record.get('author')],
+                group_id=groups[record.get('group')],
+                image=record.get('image') or '',
+            )
+            for record in records
+        ]
+    if kind == 'comments':
+        return [
+            Comment(
+                id=record.get('id'),
+                post_id=record['post'],
+                author_id=users[record['author']],
+                text=record['text'],
+                created=parse_datetime(record['created']),
+            )
+            for record in records
+        ]
+    return [
+        Follow(user_id=users[record['user']],
+               author_id=users[record['author']])
+        for record in records
+    ]
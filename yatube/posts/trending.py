@@ -0,0 +1,138 @@
+"""Популярные посты: счёт с затуханием, который обновляется по событиям.
+
+Каждый новый пост и комментарий прибавляет вес к строке TrendingScore
+своего поста (UPDATE ... SET score = score + вес), а GROUP BY по
+комментариям при чтении не нужен. Команда decay_trending раз в
+POSTS_TRENDING_DECAY_INTERVAL секунд умножает все счета на
+0.5 ** (интервал / POSTS_TRENDING_HALF_LIFE) и удаляет строки ниже
+POSTS_TRENDING_MIN_SCORE, поэтому в таблице остаются только недавно
+активные посты. Группа поста продублирована в строке: топ группы
+читается одним запросом по индексу (group, -score).
+"""
+import math
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import seeding
+from .models import Comment, Post, TrendingScore
+
+POST_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+
+
+def add_post(post):
+    TrendingScore.objects.get_or_create(
+        post_id=post.pk,
+        defaults={'group_id': post.group_id, 'score': POST_WEIGHT},
+    )
+
+
+def move_post(post):
+    """Переносит счёт за постом при смене группы."""
+    TrendingScore.objects.filter(post_id=post.pk).exclude(
+        group_id=post.group_id
+    ).update(group_id=post.group_id)
+
+
+def bump(post_id, weight):
+    rows = TrendingScore.objects.filter(post_id=post_id)
+    if rows.update(score=F('score') + weight):
+        return
+    group_id = Post.objects.filter(pk=post_id).values_list(
+        'group_id', flat=True
+    ).first()
+    _, created = TrendingScore.objects.get_or_create(
+        post_id=post_id, defaults={'group_id': group_id, 'score': weight}
+    )
+    if not created:
+        # Строку успел создать соседний запрос.
+        rows.update(score=F('score') + weight)
+
+
+def comments_added(comments):
+    """Вес пачки комментариев: по одному UPDATE на пост."""
+    posts = Counter(comment.post_id for comment in comments)
+    for post_id, count in posts.items():
+        bump(post_id, count * COMMENT_WEIGHT)
+
+
+def decay(elapsed=None):
+    """Затухание за elapsed секунд и удаление остывших строк.
+
+    Возвращает (обновлено, удалено).
+    """
+    if elapsed is None:
+        elapsed = settings.POSTS_TRENDING_DECAY_INTERVAL
+    factor = 0.5 ** (elapsed / settings.POSTS_TRENDING_HALF_LIFE)
+    with transaction.atomic():
+        updated = TrendingScore.objects.update(score=F('score') * factor)
+        removed, _ = TrendingScore.objects.filter(
+            score__lt=settings.POSTS_TRENDING_MIN_SCORE
+        ).delete()
+    return updated, removed
+
+
+def rebuild(batch_size=5000):
+    """Пересчитывает таблицу по свежим постам и комментариям.
+
+    Нужен после массовых вставок без сигналов. События старше момента,
+    когда даже самый тяжёлый вес остывает ниже порога, не читаются.
+    """
+    now = timezone.now()
+    half_life = settings.POSTS_TRENDING_HALF_LIFE
+    horizon = half_life * math.log2(
+        max(POST_WEIGHT, COMMENT_WEIGHT) / settings.POSTS_TRENDING_MIN_SCORE
+    )
+    since = now - timedelta(seconds=horizon)
+
+    def decayed(weight, moment):
+        return weight * 0.5 ** ((now - moment).total_seconds() / half_life)
+
+    scores, groups = Counter(), {}
+    for post_id, group_id, pub_date in Post.objects.filter(
+        pub_date__gte=since
+    ).values_list('id', 'group_id', 'pub_date').iterator():
+        scores[post_id] += decayed(POST_WEIGHT, pub_date)
+        groups[post_id] = group_id
+    for post_id, created in Comment.objects.filter(
+        created__gte=since
+    ).values_list('post_id', 'created').iterator():
+        scores[post_id] += decayed(COMMENT_WEIGHT, created)
+    for batch in seeding.batched(scores.keys() - groups.keys(), 500):
+        groups.update(
+            Post.objects.filter(id__in=batch).values_list('id', 'group_id')
+        )
+    rows = (
+        TrendingScore(post_id=post_id, group_id=groups[post_id], score=score)
+        for post_id, score in scores.items()
+        if score >= settings.POSTS_TRENDING_MIN_SCORE
+    )
+    created = 0
+    with transaction.atomic():
+        TrendingScore.objects.all().delete()
+        for batch in seeding.batched(rows, batch_size):
+            TrendingScore.objects.bulk_create(batch)
+            created += len(batch)
+    return created
+
+
+def top_posts(limit, group=None):
+    posts = Post.objects.for_feed().filter(trending__isnull=False)
+    if group is not None:
+        posts = posts.filter(trending__group=group)
+    return list(posts.order_by('-trending__score')[:limit])
+
+
+def top_groups(limit):
+    """Группы по сумме счетов; читает только компактную таблицу."""
+    return list(
+        TrendingScore.objects.exclude(group=None)
+        .values('group__slug', 'group__title')
+        .annotate(total=Sum('score'))
+        .order_by('-total')[:limit]
+    )
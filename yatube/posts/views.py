@@ -1,24 +1,62 @@
+from http import HTTPStatus
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.contrib.messages.storage.cookie import CookieStorage
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.template.loader import render_to_string
+from django.views.decorators.http import require_POST
+
+from core.routers import replica_reads
 
+from . import (
+    comment_queue, concurrency, feed, follow_graph, search, signals,
+    suggestions, trending,
+)
+from .caching import cached_feed
+from .conditional import (
+    SITE, author_versions, feed_condition, feed_state, group_versions,
+)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+from .paginators import CursorPaginator, page_window
 
 PAGI_PAGE = 10
+COMMENTS_PAGE = 20
+TRENDING_SIZE = 10
 
 
-def pagination(queryset, request):
-    paginator = Paginator(queryset, PAGI_PAGE)
+def numbered_page(object_list, request):
+    paginator = Paginator(object_list, PAGI_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    page_obj.page_window = page_window(page_obj)
+    return page_obj
+
+
+def pagination(queryset, request):
+    if settings.POSTS_CURSOR_PAGINATION or 'cursor' in request.GET:
+        paginator = CursorPaginator(queryset, PAGI_PAGE)
+        return paginator.get_page(request.GET.get('cursor'))
+    return numbered_page(queryset, request)
+
+
+def loaded(page_obj):
+    """Выполняет выборку страницы сразу, а не при рендеринге."""
+    page_obj.object_list = list(page_obj.object_list)
     return page_obj
 
 
-@cache_page(20, key_prefix="index_page")
+@replica_reads
+@cached_feed('index')
 def index(request):
-    post_list = Post.objects.all()
+    post_list = Post.objects.for_feed()
     page_obj = pagination(post_list, request)
     context = {
         'page_obj': page_obj,
@@ -26,9 +64,32 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+def trending_index(request):
+    context = {
+        'posts': trending.top_posts(TRENDING_SIZE),
+        'groups': trending.top_groups(TRENDING_SIZE),
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+def group_trending(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    context = {
+        'group': group,
+        'posts': trending.top_posts(TRENDING_SIZE, group=group),
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+def group_state(request, slug):
+    return feed_state(request, versions=group_versions(slug))
+
+
+@replica_reads
+@feed_condition(group_state)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.for_feed()
     page_obj = pagination(posts, request)
     context = {
         'group': group,
@@ -37,33 +98,131 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+def profile_state(request, username):
+    row = User.objects.filter(username=username).values_list(
+        'id', *(f'stats__{field}' for field in AuthorStats.objects.FIELDS)
+    ).first() or (None,)
+    author_id, *stats = row
+    # Кнопка подписки и отметка взаимной подписки зависят от подписок
+    # и зрителя, и автора.
+    return feed_state(
+        request, *stats,
+        # У владельца на странице форма рекомендаций с CSRF-токеном.
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+        versions=(
+            *author_versions(author_id),
+            ('follows', request.user.pk or 0), ('follows', author_id),
+            ('suggestions', 'all'),
+        ),
+    )
+
+
+@replica_reads
+@feed_condition(profile_state)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    page_obj = pagination(post_list, request)
+    page_obj, author_stats = concurrency.gather(
+        lambda: loaded(pagination(author.posts.for_feed(), request)),
+        lambda: AuthorStats.objects.for_user(author),
+    )
+    viewer = request.user.pk
+    can_follow = viewer is not None and viewer != author.pk
     context = {
         'author': author,
+        'author_stats': author_stats,
         'page_obj': page_obj,
-        'following': True,
+        'can_follow': can_follow,
+        'following': can_follow and follow_graph.is_following(
+            viewer, author.pk),
+        'follows_you': can_follow and follow_graph.is_following(
+            author.pk, viewer),
+        'suggestions': suggestions.for_user(request.user)
+        if viewer == author.pk else [],
     }
     return render(request, 'posts/profile.html', context)
 
 
+def comments_page(post_id, cursor):
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only('text', 'created', 'post', 'author', 'author__username')
+    paginator = CursorPaginator(comments, COMMENTS_PAGE, field='created')
+    return paginator.get_page(cursor)
+
+
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    # Результаты упорядочены по релевантности, а не по дате:
+    # курсор по (pub_date, id) к ним неприменим.
+    page_obj = numbered_page(search.search_posts(query), request)
+    context = {
+        'query': query,
+        'page_query': urlencode({'q': query}) + '&',
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def post_state(request, post_id):
+    row = Post.objects.filter(id=post_id).values_list(
+        *(f'author__stats__{field}' for field in AuthorStats.objects.FIELDS)
+    ).annotate(
+        newest=Max('comments__created'), comments_count=Count('comments')
+    ).first() or (None, None)
+    *stats, newest_comment, comments_count = row
+    return feed_state(
+        request, *stats, newest_comment, comments_count,
+        # В странице есть форма комментария с CSRF-токеном и
+        # сообщение о комментарии, который ещё в очереди.
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+        request.COOKIES.get(CookieStorage.cookie_name),
+        versions=(SITE, ('post', post_id)),
+    )
+
+
+@replica_reads
+@feed_condition(post_state)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), id=post_id
+    )
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    comments = comments_page(post.id, request.GET.get('comments_cursor'))
     context = {
         'post': post,
+        'author_stats': AuthorStats.objects.for_user(post.author),
         'form': form,
         'comments': comments,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    if not Post.objects.filter(id=post_id).exists():
+        raise Http404
+    comments = comments_page(post_id, request.GET.get('cursor'))
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.id,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created,
+                }
+                for comment in comments
+            ],
+            'next_cursor': comments.next_cursor,
+        })
+    return render(request, 'posts/includes/comment_list.html', {
+        'post_id': post_id,
+        'comments': comments,
+    })
+
+
 @login_required
 def post_create(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if request.method == 'POST':
         if form.is_valid():
             post = form.save(commit=False)
@@ -106,16 +265,39 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        saved = comment_queue.submit(comment)
+        if request.is_ajax():
+            return JsonResponse({'html': render_to_string(
+                'posts/includes/comment_item.html',
+                {'comment': comment},
+                request=request,
+            ), 'pending': not saved}, status=(
+                HTTPStatus.CREATED if saved else HTTPStatus.ACCEPTED
+            ))
+        if not saved:
+            messages.info(
+                request, 'Комментарий сохраняется и скоро появится.')
+    elif request.is_ajax():
+        return JsonResponse(
+            {'errors': form.errors}, status=HTTPStatus.BAD_REQUEST
+        )
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@replica_reads
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
+    if settings.POSTS_FEED_FANOUT:
+        post_list = feed.followed_posts(request.user)
+    else:
+        post_list = Post.objects.for_feed().filter(
+            author_id__in=Follow.objects.filter(
+                user=request.user).values('author_id')
+        )
     page_obj = pagination(post_list, request)
     context = {
         'page_obj': page_obj,
+        'suggestions': suggestions.for_user(request.user),
     }
     return render(request, 'posts/follow.html', context)
 
@@ -124,15 +306,39 @@ def follow_index(request):
 def profile_follow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
-    if user != author and not Follow.objects.filter(author__username=username):
-        Follow.objects.create(user=user, author=author)
-    return redirect('posts:profile_follow', username=author.username)
+    # Запись не доверяет кэшу: повтор отсекает уникальность пары.
+    if user != author:
+        Follow.objects.get_or_create(user=user, author=author)
+    return redirect('posts:profile', username=author.username)
 
 
 @login_required
 def profile_unfollow(request, username):
-    follow = Follow.objects.filter(
-        author__username=username, user=request.user
-    )
-    follow.delete()
-    return redirect('posts:profile_unfollow', username=username)
+    author = get_object_or_404(User, username=username)
+    Follow.objects.filter(user=request.user, author=author).delete()
+    return redirect('posts:profile', username=author.username)
+
+
+@login_required
+@require_POST
+def follow_batch(request):
+    """Подписка или отписка на список авторов одной транзакцией."""
+    authors = set(User.objects.filter(
+        username__in=request.POST.getlist('usernames')
+    ).exclude(pk=request.user.pk).values_list('id', flat=True))
+    follows = Follow.objects.filter(user=request.user, author_id__in=authors)
+    with transaction.atomic():
+        if request.POST.get('action') == 'unfollow':
+            # Удаление QuerySet шлёт post_delete по каждой строке.
+            changed = follows.delete()[0]
+        else:
+            new = authors - set(follows.values_list('author_id', flat=True))
+            Follow.objects.bulk_create(
+                [Follow(user=request.user, author_id=pk) for pk in new],
+                ignore_conflicts=True,
+            )
+            signals.follows_created(request.user.pk, new)
+            changed = len(new)
+    if request.is_ajax():
+        return JsonResponse({'changed': changed})
+    return redirect('posts:follow_index')
@@ -28,6 +28,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestProfilingMiddleware',
+    'core.middleware.PrimaryPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -39,12 +41,27 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'yatube.urls'
 
+# Разобранные шаблоны кэшируются в памяти процесса (cached.Loader).
+# По умолчанию кэш включён только без DEBUG; YATUBE_TEMPLATE_CACHE=1
+# включает его и при DEBUG. С кэшем все шаблоны из templates/
+# компилируются при старте процесса (CoreConfig.ready).
+TEMPLATE_CACHE = os.getenv(
+    'YATUBE_TEMPLATE_CACHE', '0' if DEBUG else '1'
+) == '1'
+TEMPLATE_WARMUP = TEMPLATE_CACHE
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ] if TEMPLATE_CACHE else TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -58,13 +75,54 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# Потоков для представлений под ASGI (yatube/asgi.py).
+ASGI_THREADS = int(os.getenv('YATUBE_ASGI_THREADS', '16'))
+
+# Профиль базы выбирается переменной окружения YATUBE_DB_PROFILE.
+# production держит соединения открытыми и включает PRAGMA из ключа
+# PRAGMAS (core/db.py, сигнал connection_created); timeout — сколько
+# секунд ждать чужую блокировку записи.
+DATABASE_PROFILES = {
+    'default': {},
+    'production': {
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {'timeout': 20},
+        'PRAGMAS': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'mmap_size': 256 * 1024 * 1024,
+            # Отрицательное значение — размер в КиБ, а не в страницах.
+            'cache_size': -64 * 1024,
+            'busy_timeout': 20000,
+            'temp_store': 'MEMORY',
+        },
+    },
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        **DATABASE_PROFILES[os.getenv('YATUBE_DB_PROFILE', 'default')],
     }
 }
 
+# Реплики для чтения: пути к копиям базы через запятую в
+# YATUBE_DB_REPLICAS. Локально копию обновляет команда sync_replicas.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.getenv('YATUBE_DB_REPLICAS', '').split(','))
+):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': replica,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи клиент читает из основной базы.
+REPLICA_PIN_SECONDS = 5
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -103,10 +161,116 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кэш выбирается переменной окружения YATUBE_CACHE. locmem годится для
+# тестов и одного процесса; при нескольких воркерах нужен общий бэкенд,
+# иначе инвалидация версий не доходит до соседних процессов. Общему
+# бэкенду нужны атомарные add() и incr(): на них держатся блокировка
+# рендера лент и счётчики версий, поэтому файловый кэш Django не годится.
+# memcached требует пакет python-memcached, в requirements.txt его нет.
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sqlite': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.getenv(
+            'YATUBE_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache.sqlite3')
+        ),
+    },
+    'memcached': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': os.getenv('YATUBE_CACHE_LOCATION', '127.0.0.1:11211'),
+    },
+}
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        **CACHE_BACKENDS[os.getenv('YATUBE_CACHE', 'locmem')],
+        'KEY_PREFIX': 'yatube',
+        'TIMEOUT': 300,
     }
 }
 
+# Ленты по курсору (?cursor=) вместо номеров страниц: без COUNT и OFFSET.
+POSTS_CURSOR_PAGINATION = False
+
+# Лента подписок из материализованных FeedEntry (fan-out-on-write).
+POSTS_FEED_FANOUT = True
+POSTS_FEED_FANOUT_BATCH = 1000
+# Посты авторов с большим числом подписчиков подмешиваются при чтении;
+# None отключает гибридный режим.
+POSTS_FEED_FANOUT_MAX_FOLLOWERS = 10000
+POSTS_FEED_BACKFILL_LIMIT = 1000
+
+# Сколько секунд живут множества подписок в кэше (posts.follow_graph).
+POSTS_FOLLOW_GRAPH_TIMEOUT = 3600
+
+# Популярные посты (posts.trending): вес событий затухает вдвое за
+# POSTS_TRENDING_HALF_LIFE секунд. Команда decay_trending запускается раз
+# в POSTS_TRENDING_DECAY_INTERVAL секунд и удаляет строки ниже MIN_SCORE.
+POSTS_TRENDING_HALF_LIFE = 6 * 3600
+POSTS_TRENDING_DECAY_INTERVAL = 3600
+POSTS_TRENDING_MIN_SCORE = 0.05
+
+# Кэш страниц лент сбрасывается сигналами; таймаут лишь страховка.
+POSTS_FEED_CACHE_TIMEOUT = 600
+# Пауза перед тем, как самому рисовать страницу, которой нет в кэше,
+# пока её рисует другой воркер; ждём один раз, без опроса.
+POSTS_FEED_CACHE_WAIT = 0.05
+
+# Миниатюры готовятся в пуле потоков после сохранения поста с картинкой;
+# при False — синхронно после коммита, а пропущенные догоняет команда
+# generate_thumbnails: страница никогда не готовит их сама.
+POSTS_THUMBNAIL_ASYNC = True
+POSTS_THUMBNAIL_WORKERS = 2
+
+# Комментарии через очередь: фоновый поток собирает их в пачки
+# bulk_create раз в POSTS_COMMENT_FLUSH_INTERVAL секунд.
+POSTS_COMMENT_WRITE_BEHIND = False
+POSTS_COMMENT_FLUSH_INTERVAL = 0.005
+POSTS_COMMENT_BATCH = 500
+# 'commit' — ответ после коммита пачки с комментарием;
+# 'queued' — сразу после постановки в очередь (при падении процесса
+# комментарии из очереди теряются).
+POSTS_COMMENT_DURABILITY = 'commit'
+POSTS_COMMENT_COMMIT_TIMEOUT = 5
+
+# Независимые выборки страницы (posts.concurrency.gather) в пуле
+# потоков, каждая со своим соединением с базой.
+POSTS_PARALLEL_FETCH = False
+POSTS_PARALLEL_FETCH_WORKERS = 8
+
+# Профилирование запросов: Server-Timing, журнал yatube.requests и
+# cProfile каждого PROFILE_EVERY-го запроса (0 — без cProfile).
+REQUEST_PROFILING = {
+    'ENABLED': os.getenv('YATUBE_PROFILING') == '1',
+    'PROFILE_EVERY': int(os.getenv('YATUBE_PROFILE_EVERY', '0')),
+    'PROFILE_DIR': os.path.join(BASE_DIR, 'profiles'),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'requests_file': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.path.join(BASE_DIR, 'requests.log'),
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'yatube.requests': {
+            'handlers': ['requests_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'